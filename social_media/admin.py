@@ -1,3 +1,27 @@
 from django.contrib import admin
 
-# Register your models here.
+from social_media.models import Profile
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    """Read only ring buffer of profiles of slow requests and tasks"""
+
+    list_display = (
+        "created_at",
+        "kind",
+        "name",
+        "duration",
+        "query_count",
+        "query_duration",
+        "trigger",
+    )
+    list_filter = ("kind", "trigger", "name")
+    search_fields = ("name", "description")
+    ordering = ("-created_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,166 @@
+import json
+import math
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from social_media.models import Comment, Hashtag, Post
+from social_media.urls import router
+
+BUDGETS_PATH = Path(__file__).with_name("benchmark_budgets.json")
+
+# objects of detail endpoints: the most popular ones, where N+1 queries and
+# large pages show the most
+SAMPLE_ORDERING = {
+    get_user_model(): ("-subscribers_count", "id"),
+    Post: ("-comments_count", "id"),
+    Comment: ("-likes_count", "id"),
+    Hashtag: ("id",),
+}
+
+# query parameters required by endpoints
+QUERY_PARAMS = {
+    "user-autocomplete": {"q": "seed"},
+    "post-search": {"q": "post"},
+}
+
+# GET endpoints outside of the router
+EXTRA_ENDPOINTS = ("user:manage",)
+
+
+def get_sample(model):
+    if model not in SAMPLE_ORDERING:
+        return None
+
+    return model.objects.order_by(*SAMPLE_ORDERING[model]).first()
+
+
+def get_router_endpoints() -> dict[str, str]:
+    """URLs of GET endpoints of all router viewsets, keyed by route name.
+    Detail endpoints use the sample object of their model and are skipped
+    when there is none"""
+    endpoints = {}
+
+    for _, viewset, basename in router.registry:
+        sample = get_sample(viewset.queryset.model)
+        lookup = getattr(sample, viewset.lookup_field, None)
+        routes = []
+
+        if hasattr(viewset, "list"):
+            routes.append(("list", False))
+
+        if hasattr(viewset, "retrieve"):
+            routes.append(("detail", True))
+
+        routes += [
+            (action.url_name, action.detail)
+            for action in viewset.get_extra_actions()
+            if "get" in action.mapping
+        ]
+
+        for url_name, detail in routes:
+            if detail and lookup is None:
+                continue
+
+            name = f"{basename}-{url_name}"
+            endpoints[name] = reverse(
+                f"social_media:{name}", args=[lookup] if detail else []
+            )
+
+    return endpoints
+
+
+def get_endpoints() -> dict[str, str]:
+    endpoints = get_router_endpoints()
+    endpoints.update({name: reverse(name) for name in EXTRA_ENDPOINTS})
+    return endpoints
+
+
+def get_percentile(values: list[float], percentile: int) -> float:
+    ordered = sorted(values)
+    index = max(math.ceil(len(ordered) * percentile / 100) - 1, 0)
+    return ordered[index]
+
+
+def measure(client, url: str, params: dict, iterations: int) -> dict:
+    """Query count, latency percentiles and peak Python memory of a GET
+    request. The cache is cleared before every request, so cached responses
+    don't hide the work"""
+    latencies = []
+
+    # the first request is a warm-up, it is not measured
+    for _ in range(iterations + 1):
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    # read before the next request resets the query log
+    query_count = len(queries)
+
+    cache.clear()
+    tracemalloc.start()
+    client.get(url, params)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "url": url,
+        "status": response.status_code,
+        "queries": query_count,
+        "p50_ms": round(get_percentile(latencies[1:], 50), 2),
+        "p99_ms": round(get_percentile(latencies[1:], 99), 2),
+        "peak_memory_kb": round(peak_memory / 1024, 1),
+    }
+
+
+def run_benchmark(iterations: int) -> dict[str, dict]:
+    """Measure every GET endpoint as the user with most subscriptions"""
+    viewer = (
+        get_user_model().objects.order_by("-subscriptions_count", "id").first()
+    )
+    client = APIClient()
+    client.force_authenticate(viewer)
+
+    return {
+        name: measure(client, url, QUERY_PARAMS.get(name, {}), iterations)
+        for name, url in get_endpoints().items()
+    }
+
+
+def load_budgets(path=BUDGETS_PATH) -> dict[str, dict]:
+    with open(path) as file:
+        return json.load(file)
+
+
+def check_budgets(
+    results: dict, budgets: dict, fields: tuple | None = None
+) -> list[str]:
+    """Descriptions of results exceeding their budget. A budget limits any
+    of the numeric result fields, or only the given 'fields'. Failed
+    requests always exceed it"""
+    failures = []
+
+    for name, result in results.items():
+        if result["status"] >= 400:
+            failures.append(f"{name}: status {result['status']}")
+
+        for field, limit in budgets.get(name, {}).items():
+            if fields is not None and field not in fields:
+                continue
+
+            if result[field] > limit:
+                failures.append(
+                    f"{name}: {field} {result[field]} exceeds {limit}"
+                )
+
+    return failures
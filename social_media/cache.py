@@ -0,0 +1,80 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from prometheus_client import Counter
+
+from social_media.metrics import record_cache_lookup
+from social_media.models import Comment
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "response_cache_requests_total",
+    "Response cache lookups",
+    ["resource", "result"],
+)
+
+
+def get_version_key(resource: str, pk) -> str:
+    return f"response:{resource}:{pk}:version"
+
+
+def get_version(resource: str, pk) -> int:
+    """Current version of cached responses of the object. Versions are
+    timestamps, so a version lost on eviction or expiry never matches stale
+    keys"""
+    key = get_version_key(resource, pk)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(
+            key, time.time_ns(), timeout=settings.RESPONSE_VERSION_TIMEOUT
+        )
+        version = cache.get(key)
+
+    return version
+
+
+def get_response_key(resource: str, pk, request) -> str:
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"response:{resource}:{pk}:{get_version(resource, pk)}:{url}"
+
+
+def get_cached_response(resource: str, pk, request):
+    data = cache.get(get_response_key(resource, pk, request))
+    RESPONSE_CACHE_REQUESTS.labels(
+        resource, "miss" if data is None else "hit"
+    ).inc()
+    record_cache_lookup(data is not None)
+    return data
+
+
+def set_cached_response(resource: str, pk, request, data) -> None:
+    cache.set(
+        get_response_key(resource, pk, request),
+        data,
+        timeout=settings.RESPONSE_CACHE_TIMEOUT,
+    )
+
+
+def invalidate(resource: str, *pks) -> None:
+    """Bump versions of the objects once the transaction is committed, so
+    their cached responses are never read again"""
+
+    def bump_versions():
+        cache.set_many(
+            {get_version_key(resource, pk): time.time_ns() for pk in pks},
+            timeout=settings.RESPONSE_VERSION_TIMEOUT,
+        )
+
+    transaction.on_commit(bump_versions)
+
+
+def invalidate_post(obj) -> None:
+    """Invalidate detail of the Post, or of the Post the Comment belongs to"""
+    invalidate("post", obj.post_id if isinstance(obj, Comment) else obj.pk)
+
+
+def invalidate_user(*users) -> None:
+    invalidate("user", *(user.pk for user in users))
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from social_media.models import Post, Comment
+
+
+def increment(model, pk: int, field: str, delta: int = 1) -> None:
+    """Atomically change denormalized counter 'field' of the row by 'delta'.
+    Counters drifted to 0 stay there until 'reconcile_counters' fixes them"""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def increment_many(model, pks, field: str, delta: int = 1) -> None:
+    """Same as 'increment' for every row in 'pks' with a single UPDATE"""
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def count_subquery(queryset, field: str) -> Coalesce:
+    """Returns correlated subquery counting rows of 'queryset' that point
+    to the outer row through 'field'"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("*"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def get_counter_updates() -> dict:
+    """Map of model -> counter fields with expressions of their real values"""
+    subscriptions = get_user_model().subscribed_to.through.objects
+
+    return {
+        get_user_model(): {
+            "subscribers_count": count_subquery(subscriptions, "to_user"),
+            "subscriptions_count": count_subquery(subscriptions, "from_user"),
+        },
+        Post: {
+            "likes_count": count_subquery(
+                Post.users_liked.through.objects, "post"
+            ),
+            "comments_count": count_subquery(Comment.objects, "post"),
+        },
+        Comment: {
+            "likes_count": count_subquery(
+                Comment.users_liked.through.objects, "comment"
+            ),
+        },
+    }
+
+
+def reconcile_counters(model, counters: dict, batch_size: int) -> int:
+    """Recalculate counters of 'model' with one UPDATE per primary key range
+    of 'batch_size' rows. Returns number of updated rows"""
+    updated = 0
+    last_pk = (
+        model.objects.order_by("-pk").values_list("pk", flat=True).first()
+    )
+
+    if last_pk is None:
+        return updated
+
+    for start in range(0, last_pk + 1, batch_size):
+        updated += model.objects.filter(
+            pk__gte=start, pk__lt=start + batch_size
+        ).update(**counters)
+
+    return updated
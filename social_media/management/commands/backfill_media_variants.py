@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from social_media.media import variants_are_stale
+from social_media.signals import MEDIA_FIELDS
+from social_media.tasks import generate_media_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue generation of resized variants of images uploaded before "
+        "variants existed"
+    )
+
+    def handle(self, *args, **options):
+        for model, (field_name, variants_field) in MEDIA_FIELDS.items():
+            self.stdout.write(f"Queueing {model.__name__} images...")
+            queryset = model.objects.exclude(
+                **{f"{field_name}__isnull": True}
+            ).exclude(**{field_name: ""})
+
+            for obj in queryset.iterator(chunk_size=1000):
+                if variants_are_stale(
+                    getattr(obj, field_name), getattr(obj, variants_field)
+                ):
+                    generate_media_variants.delay(
+                        model._meta.label, obj.pk, field_name, variants_field
+                    )
+
+        self.stdout.write(self.style.SUCCESS("Media variants are queued!"))
@@ -0,0 +1,64 @@
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from social_media.models import Post
+from social_media.timeline import get_timeline, get_subscriber_ids
+
+
+class Command(BaseCommand):
+    help = "Fill home timelines with latest posts of subscribed accounts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            nargs="*",
+            help="Ids of users whose timelines are filled (default: all)",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=settings.TIMELINE_BACKFILL_POSTS,
+            help="Number of latest posts of every author to add",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of subscribers whose timelines are filled at once",
+        )
+
+    def handle(self, *args, **options):
+        timeline = get_timeline()
+        batch_size = options["batch_size"]
+        # posts of popular accounts are pulled on read instead
+        authors = get_user_model().objects.filter(
+            user__isnull=False,
+            subscribers_count__lte=settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS,
+        )
+
+        if options["user"]:
+            authors = authors.filter(user__in=options["user"])
+
+        authors = authors.distinct().values_list("id", flat=True)
+
+        for author_id in authors.iterator():
+            subscriber_ids = get_subscriber_ids(author_id)
+
+            if options["user"]:
+                subscriber_ids = subscriber_ids.filter(id__in=options["user"])
+
+            posts = list(
+                Post.objects.filter(user_id=author_id).order_by("-created_at")[
+                    : options["limit"]
+                ]
+            )
+            subscriber_ids = subscriber_ids.iterator(chunk_size=batch_size)
+
+            while batch := list(islice(subscriber_ids, batch_size)):
+                timeline.add(posts, batch)
+
+        self.stdout.write(self.style.SUCCESS("Timelines are filled!"))
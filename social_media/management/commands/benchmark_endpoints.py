@@ -0,0 +1,112 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from social_media.benchmark import (
+    BUDGETS_PATH,
+    check_budgets,
+    load_budgets,
+    run_benchmark,
+)
+from social_media.seeding import seed_social_graph
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a test database with a synthetic social graph and measure "
+        "query count, latency and memory of every GET endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument(
+            "--subscriptions",
+            type=int,
+            default=20,
+            help="Number of accounts every user is subscribed to",
+        )
+        parser.add_argument(
+            "--posts", type=int, default=5, help="Number of posts per user"
+        )
+        parser.add_argument(
+            "--comments",
+            type=float,
+            default=3,
+            help="Average number of comments per post",
+        )
+        parser.add_argument(
+            "--likes",
+            type=float,
+            default=10,
+            help="Average number of likes per post",
+        )
+        parser.add_argument(
+            "--celebrity-exponent",
+            type=float,
+            default=1.0,
+            help="Power law exponent of subscribers per account",
+        )
+        parser.add_argument(
+            "--viral-exponent",
+            type=float,
+            default=1.0,
+            help="Power law exponent of likes and comments per post",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Measured requests per endpoint",
+        )
+        parser.add_argument(
+            "--output", help="File to write JSON results to (default: stdout)"
+        )
+        parser.add_argument(
+            "--budgets",
+            default=BUDGETS_PATH,
+            help="JSON file with per endpoint limits of the results",
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=options["verbosity"], interactive=False
+        )
+
+        try:
+            seed_social_graph(
+                users=options["users"],
+                subscriptions=options["subscriptions"],
+                posts=options["posts"],
+                comments=options["comments"],
+                likes=options["likes"],
+                celebrity_exponent=options["celebrity_exponent"],
+                viral_exponent=options["viral_exponent"],
+                seed=options["seed"],
+            )
+            results = run_benchmark(options["iterations"])
+        finally:
+            teardown_databases(old_config, verbosity=options["verbosity"])
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        failures = check_budgets(results, load_budgets(options["budgets"]))
+
+        if failures:
+            raise CommandError("Budgets exceeded:\n" + "\n".join(failures))
+
+        self.stdout.write(self.style.SUCCESS("All budgets are met!"))
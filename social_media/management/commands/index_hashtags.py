@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from social_media.models import Post, Comment
+from social_media.tags import index_text
+
+
+class Command(BaseCommand):
+    help = "Parse hashtags and mentions of existing posts and comments"
+
+    def handle(self, *args, **options):
+        for model in (Post, Comment):
+            self.stdout.write(f"Indexing {model.__name__} texts...")
+
+            for obj in model.objects.iterator(chunk_size=1000):
+                index_text(obj, created=False)
+
+        self.stdout.write(self.style.SUCCESS("Hashtags are indexed!"))
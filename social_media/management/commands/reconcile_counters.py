@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from social_media.counters import get_counter_updates, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recalculate denormalized like and comment counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of rows updated by a single query",
+        )
+
+    def handle(self, *args, **options):
+        for model, counters in get_counter_updates().items():
+            self.stdout.write(f"Reconciling {model.__name__} counters...")
+            updated = reconcile_counters(
+                model, counters, options["batch_size"]
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"{updated} {model.__name__} rows updated")
+            )
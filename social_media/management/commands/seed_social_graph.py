@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand
+
+from social_media.seeding import SEED_PASSWORD, seed_social_graph
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk load a synthetic social graph of users, subscriptions, posts, "
+        "comments and likes for load testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument(
+            "--subscriptions",
+            type=int,
+            default=50,
+            help="Number of accounts every user is subscribed to",
+        )
+        parser.add_argument(
+            "--posts", type=int, default=10, help="Number of posts per user"
+        )
+        parser.add_argument(
+            "--comments",
+            type=float,
+            default=2,
+            help="Average number of comments per post",
+        )
+        parser.add_argument(
+            "--likes",
+            type=float,
+            default=10,
+            help="Average number of likes per post",
+        )
+        parser.add_argument(
+            "--celebrity-exponent",
+            type=float,
+            default=1.0,
+            help="Power law exponent of subscribers per account, "
+            "0 for uniform",
+        )
+        parser.add_argument(
+            "--viral-exponent",
+            type=float,
+            default=1.0,
+            help="Power law exponent of likes and comments per post, "
+            "0 for uniform",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed, the same seed generates the same graph",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of rows inserted at once",
+        )
+        parser.add_argument(
+            "--skip-timelines",
+            action="store_true",
+            help="Don't fill home timelines of the users",
+        )
+
+    def handle(self, *args, **options):
+        seed_social_graph(
+            users=options["users"],
+            subscriptions=options["subscriptions"],
+            posts=options["posts"],
+            comments=options["comments"],
+            likes=options["likes"],
+            celebrity_exponent=options["celebrity_exponent"],
+            viral_exponent=options["viral_exponent"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            timelines=not options["skip_timelines"],
+            progress=self.stdout.write,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Social graph is seeded! Password of the users is "
+                f"'{SEED_PASSWORD}'"
+            )
+        )
@@ -0,0 +1,139 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.move import file_move_safe
+from django.core.files.storage import default_storage, FileSystemStorage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+VARIANT_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+
+def encode_image(image: Image.Image, image_format: str) -> ContentFile:
+    """Re-encode image without metadata, so EXIF is stripped"""
+    buffer = BytesIO()
+
+    if image_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+
+    image.save(
+        buffer,
+        format=image_format,
+        quality=settings.MEDIA_VARIANT_QUALITY,
+        optimize=image_format == "JPEG",
+    )
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(field_file) -> dict:
+    """Save resized WebP and JPEG copies of the image next to it. Returns
+    {"source": <image name>, <size>: {<format>: <variant name>}}"""
+    with field_file.open("rb") as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+
+    base, _ = os.path.splitext(field_file.name)
+    variants = {"source": field_file.name}
+
+    for size, width in settings.MEDIA_VARIANT_WIDTHS.items():
+        variant = image.copy()
+        variant.thumbnail((width, width * 4))
+        variants[size] = {
+            extension: default_storage.save(
+                f"{base}-{size}.{extension}",
+                encode_image(variant, image_format),
+            )
+            for extension, image_format in VARIANT_FORMATS.items()
+        }
+
+    return variants
+
+
+def delete_variants(variants: dict) -> None:
+    for size, names in variants.items():
+        if size != "source":
+            for name in names.values():
+                default_storage.delete(name)
+
+
+def variants_are_stale(field_file, variants: dict) -> bool:
+    """True if variants were generated from another image than the one
+    currently stored in the field"""
+    return (field_file.name or None) != variants.get("source")
+
+
+class UploadSizeLimitHandler(FileUploadHandler):
+    """Aborts the request as soon as an uploaded file exceeds
+    MEDIA_MAX_UPLOAD_SIZE, before the rest of it is received. The parse
+    error is returned by DRF as a JSON 400 response. Passes chunks on to
+    the next handler otherwise"""
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.MEDIA_MAX_UPLOAD_SIZE:
+            raise MultiPartParserError(
+                "Uploaded file exceeds MEDIA_MAX_UPLOAD_SIZE."
+            )
+
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def validate_image_upload(file) -> None:
+    """Check size and dimensions of an image reading only its header"""
+    if file.size > settings.MEDIA_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            "File is too large, max size is %(size)s.",
+            params={"size": filesizeformat(settings.MEDIA_MAX_UPLOAD_SIZE)},
+        )
+
+    position = file.tell()
+    file.seek(0)
+
+    try:
+        width, height = Image.open(file).size
+    except Exception:
+        # invalid images are reported by ImageField itself
+        return
+    finally:
+        file.seek(position)
+
+    if width * height > settings.MEDIA_MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            "Image is too large, max resolution is %(pixels)s pixels.",
+            params={"pixels": settings.MEDIA_MAX_IMAGE_PIXELS},
+        )
+
+
+def move_file(name: str, new_name: str) -> str:
+    """Move a stored file to 'new_name' without reading it into memory.
+    Returns the name it was saved under"""
+    new_name = default_storage.get_available_name(new_name)
+
+    if isinstance(default_storage, FileSystemStorage):
+        path = default_storage.path(new_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_move_safe(default_storage.path(name), path)
+        return new_name
+
+    with default_storage.open(name, "rb") as file:
+        new_name = default_storage.save(new_name, file)
+
+    default_storage.delete(name)
+    return new_name
+
+
+def attach_file(instance, field_name: str, name: str) -> None:
+    """Attach a stored file to the file field by moving it to the field's
+    'upload_to' path. Unlike assigning a File, content is not re-saved"""
+    field_file = getattr(instance, field_name)
+    upload_name = field_file.field.generate_filename(
+        instance, os.path.basename(name)
+    )
+    field_file.name = move_file(name, upload_name)
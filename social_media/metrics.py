@@ -0,0 +1,238 @@
+import os
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import cache as memoize
+from ipaddress import ip_address, ip_network
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route",
+    ["route", "method"],
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests by route and status code",
+    ["route", "method", "status"],
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, float("inf")),
+)
+DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries per request",
+    ["route"],
+)
+CACHE_LOOKUPS = Counter(
+    "http_request_cache_lookups_total",
+    "Cache lookups made by requests",
+    ["route", "result"],
+)
+SERIALIZER_DURATION = Histogram(
+    "http_request_serializer_duration_seconds",
+    "Time spent building response data by serializers per request",
+    ["route"],
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Response body size",
+    ["route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, float("inf")),
+)
+
+# RequestMetrics of the request being handled
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+class RequestMetrics:
+    """Work done while handling a request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_duration = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.serializer_duration = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing queries"""
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_duration += time.perf_counter() - start
+
+    def get_server_timing(self, duration: float) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        return ", ".join(
+            [
+                f'db;dur={self.db_duration * 1000:.1f};desc="{self.queries} '
+                f'queries"',
+                f'cache;desc="{self.cache_hits} hits, '
+                f'{self.cache_misses} misses"',
+                f"serializer;dur={self.serializer_duration * 1000:.1f}",
+                f"total;dur={duration * 1000:.1f}",
+            ]
+        )
+
+
+def record_cache_lookup(hit: bool) -> None:
+    metrics = current_metrics.get()
+
+    if metrics is None:
+        return
+
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def get_route(request) -> str:
+    """Route name like 'social_media:post-subscriptions', so metrics don't
+    grow with the number of objects"""
+    if request.resolver_match is None:
+        return "unresolved"
+
+    return request.resolver_match.view_name
+
+
+def get_response_size(response) -> int | None:
+    if response.streaming:
+        return None
+
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    """Record latency, database queries, cache lookups, serializer time
+    and response size of every request. Totals are exported as Prometheus
+    metrics labelled by route, and the request's own numbers are sent back
+    in the Server-Timing header"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query)
+                    )
+
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+
+        duration = time.perf_counter() - start
+        route = get_route(request)
+
+        REQUEST_LATENCY.labels(route, request.method).observe(duration)
+        REQUESTS.labels(route, request.method, response.status_code).inc()
+        DB_QUERIES.labels(route).observe(metrics.queries)
+        DB_DURATION.labels(route).observe(metrics.db_duration)
+        SERIALIZER_DURATION.labels(route).observe(metrics.serializer_duration)
+
+        if metrics.cache_hits:
+            CACHE_LOOKUPS.labels(route, "hit").inc(metrics.cache_hits)
+
+        if metrics.cache_misses:
+            CACHE_LOOKUPS.labels(route, "miss").inc(metrics.cache_misses)
+
+        size = get_response_size(response)
+
+        if size is not None:
+            RESPONSE_SIZE.labels(route).observe(size)
+
+        response["Server-Timing"] = metrics.get_server_timing(duration)
+        return response
+
+
+class TimedDataMixin:
+    """Record time of building serializer 'data' for the current request"""
+
+    @property
+    def data(self):
+        start = time.perf_counter()
+
+        try:
+            return super().data
+        finally:
+            metrics = current_metrics.get()
+
+            if metrics is not None:
+                metrics.serializer_duration += time.perf_counter() - start
+
+
+@memoize
+def get_timed_serializer_class(serializer_class):
+    return type(serializer_class)(
+        serializer_class.__name__,
+        (TimedDataMixin, serializer_class),
+        {"__module__": serializer_class.__module__},
+    )
+
+
+class SerializerTimingMixin:
+    """Views mixin recording time their serializers spend building response
+    data. Serializers of the schema generation are left as they are"""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+
+        if not getattr(self, "swagger_fake_view", False):
+            serializer.__class__ = get_timed_serializer_class(type(serializer))
+
+        return serializer
+
+
+@memoize
+def get_allowed_networks() -> list:
+    return [ip_network(network) for network in settings.METRICS_ALLOWED_IPS]
+
+
+def get_registry():
+    """Registry aggregating metrics of all worker processes when
+    PROMETHEUS_MULTIPROC_DIR is set, the current process registry
+    otherwise"""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Prometheus metrics, served only to clients from METRICS_ALLOWED_IPS"""
+    client = ip_address(request.META["REMOTE_ADDR"])
+
+    if not any(client in network for network in get_allowed_networks()):
+        raise Http404
+
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
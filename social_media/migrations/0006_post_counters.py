@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("*"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model("social_media", "Post")
+    Comment = apps.get_model("social_media", "Comment")
+
+    Post.objects.update(
+        likes_count=count_subquery(Post.users_liked.through.objects, "post"),
+        comments_count=count_subquery(Comment.objects, "post"),
+    )
+    Comment.objects.update(
+        likes_count=count_subquery(
+            Comment.users_liked.through.objects, "comment"
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0005_comment_users_liked_post_users_liked"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
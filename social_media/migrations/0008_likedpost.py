@@ -0,0 +1,91 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_liked_posts(apps, schema_editor):
+    """Index existing likes. Their time is unknown, so the creation time of
+    the liked post or comment is used"""
+    Post = apps.get_model("social_media", "Post")
+    Comment = apps.get_model("social_media", "Comment")
+    LikedPost = apps.get_model("social_media", "LikedPost")
+
+    likes = (
+        Post.users_liked.through.objects.values_list(
+            "user_id", "post_id", "post__created_at"
+        ),
+        Comment.users_liked.through.objects.values_list(
+            "user_id", "comment__post_id", "comment__created_at"
+        ),
+    )
+
+    for rows in likes:
+        batch = []
+
+        for user_id, post_id, liked_at in rows.iterator(chunk_size=1000):
+            batch.append(
+                LikedPost(user_id=user_id, post_id=post_id, liked_at=liked_at)
+            )
+
+            if len(batch) == 1000:
+                LikedPost.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+
+        LikedPost.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("social_media", "0007_timelineentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LikedPost",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("liked_at", models.DateTimeField()),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="liked_activity",
+                        to="social_media.post",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="liked_activity",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-liked_at"], name="liked_post_user_liked"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="likedpost",
+            constraint=models.UniqueConstraint(
+                fields=("user", "post"), name="unique_liked_post"
+            ),
+        ),
+        migrations.RunPython(populate_liked_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:00
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+BATCH_SIZE = 10000
+
+
+def create_search_index(apps, schema_editor):
+    """Fill search vectors of existing posts one primary key range of
+    BATCH_SIZE rows per transaction, then index them with GIN built
+    concurrently, so posts stay writable. Other databases have no tsvector
+    and search with LIKE instead"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT MAX(id) FROM social_media_post")
+        (last_id,) = cursor.fetchone()
+
+    for start in range(0, (last_id or 0) + 1, BATCH_SIZE):
+        schema_editor.execute(
+            "UPDATE social_media_post "
+            "SET search_vector = to_tsvector(%s, text) "
+            "WHERE id >= %s AND id < %s",
+            [settings.POST_SEARCH_CONFIG, start, start + BATCH_SIZE],
+        )
+
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS post_search_vector_gin "
+        "ON social_media_post USING gin (search_vector)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS post_search_vector_gin"
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("social_media", "0008_likedpost"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
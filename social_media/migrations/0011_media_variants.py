@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0010_hashtags_mentions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="media_variants",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="media_variants",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:07
+
+from django.db import migrations, models
+import social_media.media
+import social_media.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0011_media_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="comment",
+            name="media",
+            field=models.ImageField(
+                blank=True,
+                upload_to=social_media.models.post_file_path,
+                validators=[social_media.media.validate_image_upload],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="media",
+            field=models.ImageField(
+                blank=True,
+                upload_to=social_media.models.post_file_path,
+                validators=[social_media.media.validate_image_upload],
+            ),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import social_media.media
+import social_media.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("social_media", "0012_media_upload_validators"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduledPost",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("text", models.CharField(max_length=144)),
+                (
+                    "media",
+                    models.ImageField(
+                        blank=True,
+                        upload_to=social_media.models.scheduled_post_file_path,
+                        validators=[social_media.media.validate_image_upload],
+                    ),
+                ),
+                ("publish_at", models.DateTimeField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("published", "Published"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=9,
+                    ),
+                ),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "post",
+                    models.OneToOneField(
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="scheduled_post",
+                        to="social_media.post",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="scheduled_posts",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["publish_at"],
+                        name="scheduled_post_due",
+                    ),
+                    models.Index(
+                        fields=["user", "publish_at"], name="scheduled_post_user"
+                    ),
+                ],
+            },
+        ),
+    ]
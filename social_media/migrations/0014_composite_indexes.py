@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:18
+
+from django.db import migrations, models
+
+from social_media.operations import AddIndexConcurrentlyOnPostgreSQL
+
+
+def get_like_indexes(apps):
+    """Index name, table and liked object column of users_liked tables"""
+    for model_name in ("post", "comment"):
+        through = apps.get_model(
+            "social_media", model_name
+        ).users_liked.through._meta
+        yield (
+            f"{model_name}_users_liked_user",
+            through.db_table,
+            through.get_field(model_name).column,
+        )
+
+
+def get_concurrently(schema_editor) -> str:
+    if schema_editor.connection.vendor == "postgresql":
+        return "CONCURRENTLY"
+
+    return ""
+
+
+def create_like_indexes(apps, schema_editor):
+    """Index users_liked tables by (user_id, <object>_id). Their unique
+    constraint only serves lookups starting with the liked object"""
+    for name, table, column in get_like_indexes(apps):
+        schema_editor.execute(
+            f"CREATE INDEX {get_concurrently(schema_editor)} IF NOT EXISTS "
+            f"{name} ON {table} (user_id, {column})"
+        )
+
+
+def drop_like_indexes(apps, schema_editor):
+    for name, _, _ in get_like_indexes(apps):
+        schema_editor.execute(
+            f"DROP INDEX {get_concurrently(schema_editor)} IF EXISTS {name}"
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("social_media", "0013_scheduledpost"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgreSQL(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "-created_at", "-id"],
+                name="comment_post_created",
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgreSQL(
+            model_name="post",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="post_created"
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgreSQL(
+            model_name="post",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="post_user_created",
+            ),
+        ),
+        migrations.RunPython(create_like_indexes, drop_like_indexes),
+    ]
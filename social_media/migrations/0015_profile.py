@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0014_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Profile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("request", "Request"), ("task", "Task")], max_length=7
+                    ),
+                ),
+                (
+                    "trigger",
+                    models.CharField(
+                        choices=[
+                            ("threshold", "Threshold"),
+                            ("sample", "Sample"),
+                            ("header", "Header"),
+                        ],
+                        max_length=9,
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("description", models.TextField(blank=True)),
+                ("duration", models.FloatField(help_text="Seconds")),
+                ("query_count", models.PositiveIntegerField()),
+                ("query_duration", models.FloatField(help_text="Seconds")),
+                ("queries", models.TextField(blank=True)),
+                (
+                    "stats",
+                    models.TextField(
+                        help_text="cProfile statistics, or sampled stacks in the collapsed format of flame graph tools"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
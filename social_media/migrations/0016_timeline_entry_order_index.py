@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:52
+
+from django.db import migrations, models
+
+from social_media.operations import (
+    AddIndexConcurrentlyOnPostgreSQL,
+    RemoveIndexConcurrentlyOnPostgreSQL,
+)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("social_media", "0015_profile"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgreSQL(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["user", "-created_at", "-post"],
+                name="timeline_user_created_post",
+            ),
+        ),
+        RemoveIndexConcurrentlyOnPostgreSQL(
+            model_name="timelineentry",
+            name="timeline_user_created",
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:00
+
+from django.db import migrations, models
+
+from social_media.operations import (
+    AddIndexConcurrentlyOnPostgreSQL,
+    RemoveIndexConcurrentlyOnPostgreSQL,
+)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("social_media", "0016_timeline_entry_order_index"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgreSQL(
+            model_name="hashtaguse",
+            index=models.Index(
+                fields=["hashtag", "-created_at", "-id"],
+                name="hashtag_use_tag_created",
+            ),
+        ),
+        RemoveIndexConcurrentlyOnPostgreSQL(
+            model_name="hashtaguse",
+            name="hashtag_use_tag",
+        ),
+        AddIndexConcurrentlyOnPostgreSQL(
+            model_name="mention",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="mention_user_created_id",
+            ),
+        ),
+        RemoveIndexConcurrentlyOnPostgreSQL(
+            model_name="mention",
+            name="mention_user_created",
+        ),
+    ]
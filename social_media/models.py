@@ -2,7 +2,11 @@ import os
 import uuid
 
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connection, models
+from django.utils import timezone
+
+from social_media.media import validate_image_upload
 
 
 def post_file_path(instance, filename) -> str | os.PathLike:
@@ -14,10 +18,25 @@ def post_file_path(instance, filename) -> str | os.PathLike:
     )
 
 
+def scheduled_post_file_path(instance, filename) -> str | os.PathLike:
+    _, extension = os.path.splitext(filename)
+    filename = f"scheduled-{uuid.uuid4()}{extension}"
+
+    return os.path.join(
+        "uploads", "users", instance.user.username, "scheduled", filename
+    )
+
+
 class BasePost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     text = models.CharField(max_length=144)
-    media = models.ImageField(blank=True, upload_to=post_file_path)
+    media = models.ImageField(
+        blank=True,
+        upload_to=post_file_path,
+        validators=[validate_image_upload],
+    )
+    # resized copies of media, generated by 'generate_media_variants' task
+    media_variants = models.JSONField(default=dict, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -26,23 +45,306 @@ class BasePost(models.Model):
     users_liked = models.ManyToManyField(
         to=settings.AUTH_USER_MODEL, related_name="liked_%(class)ss"
     )
+    # denormalized counter, kept in sync on like/unlike with F() updates
+    likes_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         abstract = True
 
-    @property
-    def likes_count(self):
-        """uses_liked is a related name of User model field"""
-        return self.users_liked.all().count()
+    def get_like_columns(self) -> tuple[str, str, str]:
+        """Table and column names of users_liked through model"""
+        through = self.users_liked.through._meta
+        return (
+            through.db_table,
+            through.get_field(self._meta.model_name).column,
+            through.get_field("user").column,
+        )
+
+    def add_like(self, user) -> bool:
+        """Insert like with a single 'INSERT ... ON CONFLICT DO NOTHING'.
+        Returns False if the user has already liked the object"""
+        table, obj_column, user_column = map(
+            connection.ops.quote_name, self.get_like_columns()
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({obj_column}, {user_column}) "
+                f"VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                [self.pk, user.pk],
+            )
+            return cursor.rowcount == 1
+
+    def remove_like(self, user) -> bool:
+        """Delete like with a single DELETE. Returns False if the user has
+        not liked the object"""
+        deleted, _ = self.users_liked.through.objects.filter(
+            **{self._meta.model_name: self.pk, "user": user.pk}
+        ).delete()
+        return deleted == 1
 
 
 class Post(BasePost):
-    @property
-    def comments_count(self):
-        return self.comments.all().count()
+    # denormalized counter, kept in sync on comment create/delete
+    comments_count = models.PositiveIntegerField(default=0)
+    # tsvector of text, updated on save on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # feed and keyset pagination order
+            models.Index(fields=["-created_at", "-id"], name="post_created"),
+            # posts of a user, newest first
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="post_user_created",
+            ),
+        ]
 
 
 class Comment(BasePost):
     post = models.ForeignKey(
         Post, on_delete=models.CASCADE, related_name="comments"
     )
+
+    class Meta:
+        indexes = [
+            # comments of a post, newest first
+            models.Index(
+                fields=["post", "-created_at", "-id"],
+                name="comment_post_created",
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Post delivered to the home timeline of one of author's subscribers"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    # copy of post.created_at, so the timeline is read in index order
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-post"],
+                name="timeline_user_created_post",
+            ),
+        ]
+
+
+class LikedPost(models.Model):
+    """Post the user liked, or liked a comment of, with the time of the
+    latest like. Serves the user's liked posts feed"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="liked_activity",
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="liked_activity"
+    )
+    liked_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_liked_post"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-liked_at"], name="liked_post_user_liked"
+            ),
+        ]
+
+    @classmethod
+    def record(cls, user, post_id: int) -> None:
+        """Insert or move the post to the top of user's liked posts with a
+        single upsert"""
+        cls.objects.bulk_create(
+            [cls(user=user, post_id=post_id, liked_at=timezone.now())],
+            update_conflicts=True,
+            unique_fields=["user", "post"],
+            update_fields=["liked_at"],
+        )
+
+    @classmethod
+    def forget(cls, users, post_id: int) -> None:
+        """Remove the post from liked posts of the users unless they still
+        like it or any of its comments"""
+        post_likes = Post.users_liked.through.objects.filter(
+            post=models.OuterRef("post"), user=models.OuterRef("user")
+        )
+        comment_likes = Comment.users_liked.through.objects.filter(
+            comment__post=models.OuterRef("post"),
+            user=models.OuterRef("user"),
+        )
+        cls.objects.filter(user__in=users, post_id=post_id).exclude(
+            models.Exists(post_likes)
+        ).exclude(models.Exists(comment_likes)).delete()
+
+
+class Hashtag(models.Model):
+    name = models.CharField(max_length=144, unique=True)
+
+    def __str__(self) -> str:
+        return f"#{self.name}"
+
+
+class HashtagUse(models.Model):
+    """Inverted index of hashtags used in Posts and their Comments"""
+
+    hashtag = models.ForeignKey(
+        Hashtag, on_delete=models.CASCADE, related_name="hashtag_uses"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="hashtag_uses"
+    )
+    comment = models.ForeignKey(
+        Comment,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="hashtag_uses",
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["hashtag", "-created_at", "-id"],
+                name="hashtag_use_tag_created",
+            ),
+            models.Index(
+                fields=["created_at", "hashtag"], name="hashtag_use_created"
+            ),
+        ]
+
+
+class Mention(models.Model):
+    """Inverted index of users mentioned in Posts and their Comments"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="mentions",
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="mentions"
+    )
+    comment = models.ForeignKey(
+        Comment, null=True, on_delete=models.CASCADE, related_name="mentions"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="mention_user_created_id",
+            ),
+        ]
+
+
+class TrendingHashtag(models.Model):
+    """Most used hashtags within TRENDING_HASHTAGS_WINDOW, recalculated by
+    periodic 'compute_trending_hashtags' task"""
+
+    hashtag = models.OneToOneField(
+        Hashtag,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="trending",
+    )
+    uses = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+
+class ScheduledPost(models.Model):
+    """Post waiting to be published at 'publish_at' by periodic
+    'publish_scheduled_posts' task"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        PUBLISHED = "published"
+        FAILED = "failed"
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="scheduled_posts",
+    )
+    text = models.CharField(max_length=144)
+    media = models.ImageField(
+        blank=True,
+        upload_to=scheduled_post_file_path,
+        validators=[validate_image_upload],
+    )
+    publish_at = models.DateTimeField()
+    status = models.CharField(
+        max_length=9, choices=Status.choices, default=Status.PENDING
+    )
+    error = models.TextField(blank=True)
+    post = models.OneToOneField(
+        Post,
+        null=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="scheduled_post",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["publish_at"],
+                condition=models.Q(status="pending"),
+                name="scheduled_post_due",
+            ),
+            models.Index(
+                fields=["user", "publish_at"], name="scheduled_post_user"
+            ),
+        ]
+
+
+class Profile(models.Model):
+    """Profile of a slow, sampled or staff requested HTTP request or Celery
+    task, see social_media.profiling. Only PROFILER_MAX_PROFILES newest
+    profiles are kept"""
+
+    class Kind(models.TextChoices):
+        REQUEST = "request"
+        TASK = "task"
+
+    class Trigger(models.TextChoices):
+        THRESHOLD = "threshold"
+        SAMPLE = "sample"
+        HEADER = "header"
+
+    kind = models.CharField(max_length=7, choices=Kind.choices)
+    trigger = models.CharField(max_length=9, choices=Trigger.choices)
+    # route name of requests, task name of tasks
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    duration = models.FloatField(help_text="Seconds")
+    query_count = models.PositiveIntegerField()
+    query_duration = models.FloatField(help_text="Seconds")
+    queries = models.TextField(blank=True)
+    stats = models.TextField(
+        help_text="cProfile statistics, or sampled stacks in the collapsed "
+        "format of flame graph tools"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -1,4 +1,14 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class BasicPagination(PageNumberPagination):
@@ -17,16 +27,180 @@ class BasicPagination(PageNumberPagination):
 
 
 def paginate_queryset(serializer, queryset, request):
-    serializer_instance = serializer(
-        queryset, many=True, context={"request": request}
-    )
+    """Slice queryset on the database side and serialize only the requested
+    page"""
     paginator = BasicPagination()
-    paginated_data = paginator.paginate_queryset(
-        serializer_instance.data, request
+    page = paginator.paginate_queryset(queryset, request)
+    serializer_instance = serializer(
+        page, many=True, context={"request": request}
     )
-    return paginator.get_paginated_response(paginated_data)
+    return paginator.get_paginated_response(serializer_instance.data)
 
 
 class ListPagination(PageNumberPagination):
     page_size = 10
     max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination keyed on the values of 'ordering' fields of the last
+    row on the page. Filters by position instead of OFFSET and never counts
+    rows, so every page costs the same and is stable under inserts"""
+
+    page_size = 10
+    ordering = ("-created_at", "-id")
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset)
+
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        results = list(queryset[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        return self.page
+
+    def get_position_filter(self, position: list) -> Q:
+        """Rows after 'position' in lexicographic order of 'ordering':
+        (a < x) OR (a = x AND b < y) OR ..."""
+        conditions = []
+
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {
+                previous.lstrip("-"): value
+                for previous, value in zip(self.ordering[:index], position)
+            }
+            conditions.append(
+                Q(**equal, **{f"{name}__{lookup}": position[index]})
+            )
+
+        return reduce(or_, conditions)
+
+    def get_ordering_field(self, queryset, name: str):
+        """Model field or annotation output field the queryset is ordered
+        by"""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, request, queryset) -> list | None:
+        """Position values of the cursor parsed by their ordering fields, so
+        tampered cursors are rejected instead of failing in the query"""
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(
+            self.ordering
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        parsed = []
+
+        for field, value in zip(self.ordering, position):
+            field = self.get_ordering_field(queryset, field.lstrip("-"))
+
+            try:
+                value = field.to_python(value)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+
+            parsed.append(value)
+
+        return parsed
+
+    def encode_cursor(self, instance) -> str:
+        """Dates are encoded with full microsecond precision, otherwise rows
+        created within the same millisecond would be skipped"""
+        position = [
+            getattr(instance, field.lstrip("-")) for field in self.ordering
+        ]
+        position = [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in position
+        ]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next:
+            return None
+
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1]),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class UserCursorPagination(KeysetPagination):
+    ordering = ("id",)
+
+
+class LikedPostsPagination(KeysetPagination):
+    ordering = ("-liked_at", "-id")
+
+
+class PostSearchPagination(KeysetPagination):
+    ordering = ("-relevance", "-created_at", "-id")
+
+
+class TimelineKeysetPagination(KeysetPagination):
+    ordering = ("-feed_created_at", "-feed_post_id")
+
+
+class FeedPagination(ListPagination):
+    """Page number pagination that switches to KeysetPagination when
+    requested with '?pagination=cursor'"""
+
+    mode_query_param = "pagination"
+    cursor_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+
+        if request.query_params.get(self.mode_query_param) == "cursor":
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
+
+
+class TimelinePagination(FeedPagination):
+    cursor_pagination_class = TimelineKeysetPagination
@@ -0,0 +1,256 @@
+import cProfile
+import io
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from functools import cache as memoize
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from social_media.metrics import get_route
+from social_media.models import Profile
+from user.authentication import CachedJWTAuthentication
+
+
+class StackSampler(threading.Thread):
+    """Thread sampling stacks of registered threads every 'interval'
+    seconds. Costs far less than cProfile, so every request can be sampled
+    and only the slow ones kept"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        # thread id -> Counter of sampled stacks
+        self.samples = {}
+
+    def start_sampling(self, thread_id: int) -> None:
+        self.samples[thread_id] = Counter()
+
+    def stop_sampling(self, thread_id: int) -> Counter:
+        return self.samples.pop(thread_id, Counter())
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+
+            for thread_id, stacks in list(self.samples.items()):
+                if thread_id in frames:
+                    stacks[get_stack(frames[thread_id])] += 1
+
+
+def get_stack(frame) -> str:
+    """Stack of the frame in the collapsed format, outermost call first"""
+    calls = []
+
+    while frame is not None:
+        code = frame.f_code
+        calls.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+        frame = frame.f_back
+
+    return ";".join(reversed(calls))
+
+
+@memoize
+def get_sampler() -> StackSampler:
+    """Sampler of the current process, started on first use"""
+    sampler = StackSampler(settings.PROFILER_INTERVAL)
+    sampler.start()
+    return sampler
+
+
+class Profiler:
+    """Profile of the work done by the current thread between 'start' and
+    'stop': SQL queries, and either cProfile statistics or sampled stacks"""
+
+    def __init__(self, trigger: str):
+        self.trigger = trigger
+        self.thread_id = threading.get_ident()
+        self.queries = []
+        self.query_count = 0
+        self.query_duration = 0.0
+        self.wrappers = ExitStack()
+        self.profile = None
+        self.samples = Counter()
+
+        # sampled and requested profiles are always kept, cProfile's
+        # overhead doesn't matter there
+        if trigger != Profile.Trigger.THRESHOLD:
+            self.profile = cProfile.Profile()
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper timing queries. Parameters are not
+        recorded, so profiles never hold user data"""
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.query_count += 1
+            self.query_duration += duration
+
+            if len(self.queries) < settings.PROFILER_MAX_QUERIES:
+                self.queries.append(f"{duration * 1000:.1f} ms  {sql}")
+
+    def start(self) -> None:
+        for connection in connections.all():
+            self.wrappers.enter_context(
+                connection.execute_wrapper(self.record_query)
+            )
+
+        if self.profile is None:
+            get_sampler().start_sampling(self.thread_id)
+        else:
+            self.profile.enable()
+
+        self.start_time = time.perf_counter()
+
+    def stop(self) -> None:
+        self.duration = time.perf_counter() - self.start_time
+
+        if self.profile is None:
+            self.samples = get_sampler().stop_sampling(self.thread_id)
+        else:
+            self.profile.disable()
+
+        self.wrappers.close()
+
+    def get_stats(self) -> str:
+        if self.profile is None:
+            return "\n".join(
+                f"{stack} {count}"
+                for stack, count in self.samples.most_common()
+            )
+
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats(
+            "cumulative"
+        ).print_stats(settings.PROFILER_STATS_LIMIT)
+        return stream.getvalue()
+
+    def save(self, kind: str, name: str, description: str) -> None:
+        Profile.objects.create(
+            kind=kind,
+            trigger=self.trigger,
+            name=name,
+            description=description,
+            duration=self.duration,
+            query_count=self.query_count,
+            query_duration=self.query_duration,
+            queries="\n".join(self.queries),
+            stats=self.get_stats(),
+        )
+        trim_profiles()
+
+
+def trim_profiles() -> None:
+    """Delete profiles older than PROFILER_MAX_PROFILES newest ones"""
+    oldest_kept = (
+        Profile.objects.order_by("-id")
+        .values_list("id", flat=True)[
+            settings.PROFILER_MAX_PROFILES - 1 : settings.PROFILER_MAX_PROFILES
+        ]
+        .first()
+    )
+
+    if oldest_kept is not None:
+        Profile.objects.filter(id__lt=oldest_kept).delete()
+
+
+def is_staff_request(request) -> bool:
+    """Authenticate the request as DRF views do, before the view runs, so
+    PROFILER_HEADER starts cProfile only for active staff users"""
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+
+    if authenticated is None:
+        return False
+
+    user, _ = authenticated
+    return user.is_active and user.is_staff
+
+
+def get_trigger(requested: bool) -> str:
+    if requested:
+        return Profile.Trigger.HEADER
+
+    if random.random() < settings.PROFILER_SAMPLE_RATE:
+        return Profile.Trigger.SAMPLE
+
+    return Profile.Trigger.THRESHOLD
+
+
+def is_kept(profiler: Profiler, threshold: float) -> bool:
+    """Threshold profiles are kept only for slow requests and tasks"""
+    return (
+        profiler.trigger != Profile.Trigger.THRESHOLD
+        or profiler.duration >= threshold
+    )
+
+
+class ProfilerMiddleware:
+    """Profile requests slower than PROFILER_THRESHOLD, a PROFILER_SAMPLE_RATE
+    share of all requests, and requests of staff users sending
+    PROFILER_HEADER. Enabled by PROFILER_ENABLED"""
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profiler = Profiler(
+            get_trigger(
+                settings.PROFILER_HEADER in request.headers
+                and is_staff_request(request)
+            )
+        )
+        profiler.start()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+
+        if is_kept(profiler, settings.PROFILER_THRESHOLD):
+            # query strings can hold tokens and personal data
+            profiler.save(
+                Profile.Kind.REQUEST,
+                get_route(request),
+                f"{request.method} {request.path} {response.status_code}",
+            )
+
+        return response
+
+
+# task id -> Profiler of tasks running in this worker process
+task_profilers = {}
+
+
+def start_task_profile(task_id: str) -> None:
+    profiler = Profiler(get_trigger(requested=False))
+    task_profilers[task_id] = profiler
+    profiler.start()
+
+
+def finish_task_profile(task_id: str, task_name: str, state: str) -> None:
+    profiler = task_profilers.pop(task_id, None)
+
+    if profiler is None:
+        return
+
+    profiler.stop()
+
+    if is_kept(profiler, settings.PROFILER_TASK_THRESHOLD):
+        profiler.save(Profile.Kind.TASK, task_name, f"{task_id} {state}")
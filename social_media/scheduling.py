@@ -0,0 +1,122 @@
+import logging
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from social_media.media import attach_file, move_file
+from social_media.models import Post, ScheduledPost
+from social_media.search import update_posts_search_vector
+from social_media.tags import index_texts
+
+logger = logging.getLogger(__name__)
+
+
+def get_due_batches(batch_size: int) -> list[list[int]]:
+    """Ids of due ScheduledPosts split into batches of 'batch_size'"""
+    post_ids = list(
+        ScheduledPost.objects.filter(
+            status=ScheduledPost.Status.PENDING,
+            publish_at__lte=timezone.now(),
+        )
+        .order_by("publish_at")
+        .values_list("id", flat=True)
+    )
+    return [
+        post_ids[start : start + batch_size]
+        for start in range(0, len(post_ids), batch_size)
+    ]
+
+
+def claim_posts(scheduled_post_ids: list[int]) -> list[ScheduledPost]:
+    """Lock the given ScheduledPosts which are still due. Rows locked by
+    another publisher are skipped, so concurrent publishers never get the
+    same row. Must be called inside a transaction"""
+    return list(
+        ScheduledPost.objects.select_for_update(
+            skip_locked=True, of=("self",)
+        )
+        .select_related("user")
+        .filter(
+            id__in=scheduled_post_ids,
+            status=ScheduledPost.Status.PENDING,
+            publish_at__lte=timezone.now(),
+        )
+        .order_by("publish_at")
+    )
+
+
+def get_error_message(error: Exception) -> str:
+    """Error shown to the user, storage errors are not exposed"""
+    if isinstance(error, ValidationError):
+        return " ".join(error.messages)
+
+    return "Media file could not be published."
+
+
+def prepare_post(scheduled_post: ScheduledPost) -> Post:
+    """Validate the Post and move scheduled media to its upload path"""
+    post = Post(user=scheduled_post.user, text=scheduled_post.text)
+    post.full_clean(exclude=["user", "media"], validate_unique=False)
+
+    if scheduled_post.media:
+        attach_file(post, "media", scheduled_post.media.name)
+
+    return post
+
+
+def restore_media(posts: dict, media_names: dict) -> None:
+    """Move media of prepared Posts back to their scheduled names. Both
+    arguments are keyed by ScheduledPost id"""
+    for pk, post in posts.items():
+        if post.media:
+            move_file(post.media.name, media_names[pk])
+
+
+def publish_batch(batch: list[ScheduledPost]) -> tuple[list[Post], dict]:
+    """Publish claimed ScheduledPosts with a single INSERT. Invalid ones are
+    marked as failed. Returns created Posts and errors keyed by
+    ScheduledPost id"""
+    posts = {}
+    errors = {}
+    media_names = {
+        scheduled_post.pk: scheduled_post.media.name
+        for scheduled_post in batch
+    }
+
+    for scheduled_post in batch:
+        try:
+            posts[scheduled_post.pk] = prepare_post(scheduled_post)
+        except (ValidationError, OSError) as error:
+            logger.warning(
+                "Failed to publish scheduled post %s: %r",
+                scheduled_post.pk,
+                error,
+            )
+            errors[scheduled_post.pk] = get_error_message(error)
+
+    try:
+        Post.objects.bulk_create(posts.values())
+        # bulk_create doesn't send post_save, do the work of its receivers
+        update_posts_search_vector([post.pk for post in posts.values()])
+        index_texts(posts.values())
+
+        for scheduled_post in batch:
+            if scheduled_post.pk in posts:
+                scheduled_post.status = ScheduledPost.Status.PUBLISHED
+                scheduled_post.post = posts[scheduled_post.pk]
+                scheduled_post.media = ""
+            else:
+                scheduled_post.status = ScheduledPost.Status.FAILED
+                scheduled_post.error = errors[scheduled_post.pk]
+
+        ScheduledPost.objects.bulk_update(
+            batch, ["status", "error", "post", "media"]
+        )
+    except Exception:
+        # the transaction is rolled back and the rows stay pending, keep
+        # their media where it was
+        restore_media(posts, media_names)
+        raise
+
+    return list(posts.values()), errors
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import F, IntegerField, Q, Value
+from django.db.models.functions import Cast, Greatest
+
+from social_media.models import Post
+
+
+def is_postgresql(queryset) -> bool:
+    """pg_trgm ranking is available only on PostgreSQL, other databases
+    (SQLite in tests) fall back to unranked LIKE filtering"""
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def search_users(queryset, term: str):
+    """Filter users by username or full name containing 'term', ranked by
+    trigram similarity. 'icontains' compiles to UPPER(field::text) LIKE, which
+    is served by the GIN trigram indexes from user migration 0004"""
+    queryset = queryset.filter(
+        Q(username__icontains=term) | Q(full_name__icontains=term)
+    )
+
+    if is_postgresql(queryset):
+        queryset = queryset.annotate(
+            rank=Greatest(
+                TrigramSimilarity("username", term),
+                TrigramSimilarity("full_name", term),
+            )
+        ).order_by("-rank", "id")
+
+    return queryset
+
+
+def autocomplete_users(queryset, prefix: str):
+    """Users whose username or full name starts with 'prefix', most
+    subscribed first"""
+    return queryset.filter(
+        Q(username__istartswith=prefix) | Q(full_name__istartswith=prefix)
+    ).order_by("-subscribers_count", "id")
+
+
+def update_posts_search_vector(post_ids: list[int]) -> None:
+    if is_postgresql(Post.objects):
+        Post.objects.filter(pk__in=post_ids).update(
+            search_vector=SearchVector(
+                "text", config=settings.POST_SEARCH_CONFIG
+            )
+        )
+
+
+def update_post_search_vector(post: Post) -> None:
+    update_posts_search_vector([post.pk])
+
+
+def search_posts(queryset, query: str):
+    """Filter posts matching 'query' using the GIN indexed search_vector and
+    annotate them with integer 'relevance' (rank * 1000), so results can be
+    ordered and cursor paginated by (relevance, created_at, id). On other
+    databases posts are filtered with LIKE and have the same relevance"""
+    if not is_postgresql(queryset):
+        return queryset.filter(text__icontains=query).annotate(
+            relevance=Value(0, output_field=IntegerField())
+        )
+
+    search_query = SearchQuery(
+        query, config=settings.POST_SEARCH_CONFIG, search_type="websearch"
+    )
+    return queryset.filter(search_vector=search_query).annotate(
+        relevance=Cast(
+            SearchRank(F("search_vector"), search_query) * 1000,
+            IntegerField(),
+        )
+    )
@@ -0,0 +1,322 @@
+import csv
+import io
+import json
+import math
+import random
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models
+from django.utils import timezone
+
+from social_media.counters import get_counter_updates, reconcile_counters
+from social_media.models import Comment, LikedPost, Post
+from social_media.search import update_posts_search_vector
+from social_media.tags import index_texts
+from social_media.timeline import get_subscriber_ids, get_timeline
+
+SEED_PASSWORD = "seed-password"
+HASHTAGS = 50
+
+
+def get_power_law_rank(rng, count: int, exponent: float) -> int:
+    """Rank in [0, count) drawn with probability ~ 1 / (rank + 1)^exponent,
+    so few ranks get most of the draws. Inverse transform sampling of the
+    continuous distribution, in constant time and memory"""
+    uniform = rng.random()
+
+    if exponent == 1:
+        value = (count + 1) ** uniform
+    else:
+        power = 1 - exponent
+        value = (1 + uniform * ((count + 1) ** power - 1)) ** (1 / power)
+
+    return min(int(value) - 1, count - 1)
+
+
+def get_power_law_counts(total: int, mean: float, exponent: float):
+    """Yield 'total' counts averaging 'mean', the count of the n-th item
+    being proportional to 1 / n^exponent"""
+    weights = sum(1 / rank**exponent for rank in range(1, total + 1))
+
+    for rank in range(1, total + 1):
+        yield round(mean * total / weights / rank**exponent)
+
+
+def get_distinct_ids(rng, first_id: int, total: int, count: int):
+    """Yield 'count' distinct ids of the range [first_id, first_id + total),
+    visited with a random start and step coprime to 'total'"""
+    count = min(count, total)
+    start = rng.randrange(total)
+    step = rng.randrange(1, total) if total > 1 else 1
+
+    while math.gcd(step, total) != 1:
+        step = rng.randrange(1, total)
+
+    for index in range(count):
+        yield first_id + (start + index * step) % total
+
+
+def get_next_id(model) -> int:
+    last_id = model.objects.order_by("-pk").values_list("pk", flat=True)
+    return (last_id.first() or 0) + 1
+
+
+def get_copy_value(obj, field):
+    value = field.pre_save(obj, add=True)
+
+    if value is None:
+        return r"\N"
+
+    if isinstance(field, models.JSONField):
+        return json.dumps(value)
+
+    return field.get_db_prep_save(value, connection)
+
+
+def copy_objects(model, objs: list) -> None:
+    """Insert the objects with COPY, several times faster than INSERT.
+    Columns without a value, like generated ids, are left to the database"""
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if not (field.primary_key and objs[0].pk is None)
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    for obj in objs:
+        writer.writerow([get_copy_value(obj, field) for field in fields])
+
+    buffer.seek(0)
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(quote_name(field.column) for field in fields)
+
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {quote_name(model._meta.db_table)} ({columns}) "
+            "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+
+
+def insert_objects(model, objs, batch_size: int) -> int:
+    """Insert objects of an iterable in batches, holding one batch in memory
+    at a time. Uses COPY on PostgreSQL and bulk_create on other databases.
+    Returns number of inserted objects"""
+    inserted = 0
+    objs = iter(objs)
+
+    while batch := list(islice(objs, batch_size)):
+        if connection.vendor == "postgresql":
+            copy_objects(model, batch)
+        else:
+            model.objects.bulk_create(batch)
+
+        inserted += len(batch)
+
+    return inserted
+
+
+def reset_sequences(*model_list) -> None:
+    """Move id sequences past the explicitly inserted ids"""
+    statements = connection.ops.sequence_reset_sql(no_style(), model_list)
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def iterate_batches(queryset, batch_size: int):
+    """Yield lists of objects of primary key ranges of 'batch_size' rows"""
+    pks = queryset.order_by("pk").values_list("pk", flat=True)
+    first_pk, last_pk = pks.first(), pks.last()
+
+    if first_pk is None:
+        return
+
+    for start in range(first_pk, last_pk + 1, batch_size):
+        batch = list(queryset.filter(pk__gte=start, pk__lt=start + batch_size))
+
+        if batch:
+            yield batch
+
+
+def seed_social_graph(
+    users: int,
+    subscriptions: int,
+    posts: int,
+    comments: float,
+    likes: float,
+    celebrity_exponent: float = 1.0,
+    viral_exponent: float = 1.0,
+    seed: int = 0,
+    batch_size: int = 1000,
+    timelines: bool = True,
+    progress=lambda message: None,
+) -> None:
+    """Bulk load 'users' users subscribed to 'subscriptions' accounts each,
+    with 'posts' posts each. Posts get 'comments' comments and 'likes' likes
+    on average.
+
+    Accounts to subscribe to are drawn with a power law of
+    'celebrity_exponent', so the first users become celebrities. Comments
+    and likes of posts follow a power law of 'viral_exponent', so the first
+    posts go viral. The same 'seed' generates the same graph, and rows are
+    generated lazily, so memory use doesn't grow with their number"""
+    rng = random.Random(seed)
+    user_model = get_user_model()
+    password = make_password(SEED_PASSWORD)
+    first_user_id = get_next_id(user_model)
+    first_post_id = get_next_id(Post)
+    post_total = users * posts
+
+    progress(f"Creating {users} users...")
+    insert_objects(
+        user_model,
+        (
+            user_model(
+                id=user_id,
+                email=f"seed{user_id}@example.com",
+                username=f"seed{user_id}",
+                full_name=f"Seed User {user_id}",
+                password=password,
+            )
+            for user_id in range(first_user_id, first_user_id + users)
+        ),
+        batch_size,
+    )
+
+    def get_subscriptions(user_id: int) -> set[int]:
+        subscribed_to = set()
+
+        # celebrities are drawn over and over, give up on saturation
+        for _ in range(subscriptions * 10):
+            if len(subscribed_to) >= min(subscriptions, users - 1):
+                break
+
+            rank = get_power_law_rank(rng, users, celebrity_exponent)
+            subscribed_to.add(first_user_id + rank)
+
+        return subscribed_to - {user_id}
+
+    progress("Creating subscriptions...")
+    through = user_model.subscribed_to.through
+    insert_objects(
+        through,
+        (
+            through(from_user_id=user_id, to_user_id=subscribed_to)
+            for user_id in range(first_user_id, first_user_id + users)
+            for subscribed_to in get_subscriptions(user_id)
+        ),
+        batch_size,
+    )
+
+    progress(f"Creating {post_total} posts...")
+    insert_objects(
+        Post,
+        (
+            Post(
+                id=first_post_id + index,
+                user_id=first_user_id + index // posts,
+                text=f"Post {index} of a seed user "
+                f"#tag{get_power_law_rank(rng, HASHTAGS, 1.0)}",
+            )
+            for index in range(post_total)
+        ),
+        batch_size,
+    )
+
+    progress("Creating comments...")
+    insert_objects(
+        Comment,
+        (
+            Comment(
+                post_id=first_post_id + index,
+                user_id=first_user_id + rng.randrange(users),
+                text=f"Comment on post {index}",
+            )
+            for index, count in enumerate(
+                get_power_law_counts(post_total, comments, viral_exponent)
+            )
+            for _ in range(count)
+        ),
+        batch_size,
+    )
+
+    def get_likes():
+        counts = get_power_law_counts(post_total, likes, viral_exponent)
+
+        for index, count in enumerate(counts):
+            for user_id in get_distinct_ids(rng, first_user_id, users, count):
+                yield first_post_id + index, user_id
+
+    progress("Creating likes...")
+    like_rng_state = rng.getstate()
+    liked_at = timezone.now()
+    insert_objects(
+        Post.users_liked.through,
+        (
+            Post.users_liked.through(post_id=post_id, user_id=user_id)
+            for post_id, user_id in get_likes()
+        ),
+        batch_size,
+    )
+    # liked posts feed rows of the same likes
+    rng.setstate(like_rng_state)
+    insert_objects(
+        LikedPost,
+        (
+            LikedPost(post_id=post_id, user_id=user_id, liked_at=liked_at)
+            for post_id, user_id in get_likes()
+        ),
+        batch_size,
+    )
+
+    reset_sequences(user_model, Post, Comment)
+
+    progress("Reconciling counters...")
+    for model, counters in get_counter_updates().items():
+        reconcile_counters(model, counters, batch_size)
+
+    progress("Indexing posts...")
+    seeded_posts = Post.objects.filter(pk__gte=first_post_id)
+
+    for batch in iterate_batches(seeded_posts, batch_size):
+        update_posts_search_vector([post.pk for post in batch])
+        index_texts(batch)
+
+    if timelines:
+        progress("Filling timelines...")
+        fill_timelines(first_user_id, users, batch_size)
+
+
+def fill_timelines(first_user_id: int, users: int, batch_size: int) -> None:
+    """Deliver latest posts of seeded authors to their subscribers in
+    batches. Popular accounts are skipped, as by fan-out, which also bounds
+    the number of subscribers held in memory"""
+    authors = get_user_model().objects.filter(
+        subscribers_count__lte=settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS
+    )
+
+    for start in range(first_user_id, first_user_id + users, batch_size):
+        author_ids = authors.filter(
+            pk__gte=start,
+            pk__lt=min(start + batch_size, first_user_id + users),
+        ).values_list("pk", flat=True)
+
+        for author_id in list(author_ids):
+            latest_posts = list(
+                Post.objects.filter(user_id=author_id).order_by("-created_at")[
+                    : settings.TIMELINE_BACKFILL_POSTS
+                ]
+            )
+            subscriber_ids = list(get_subscriber_ids(author_id))
+
+            for index in range(0, len(subscriber_ids), batch_size):
+                get_timeline().add(
+                    latest_posts, subscriber_ids[index : index + batch_size]
+                )
@@ -1,56 +1,216 @@
-from typing import Dict, Any
+import os
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.db import connection, transaction
 from rest_framework import serializers
-from datetime import datetime, timedelta
+from rest_framework.settings import api_settings
+from datetime import timedelta
 from django.utils import timezone as django_timezone
+from drf_spectacular.utils import extend_schema_field
 
-from social_media.models import Post, Comment
+from social_media.cache import invalidate_post
+from social_media.counters import increment, increment_many
+from social_media.media import variants_are_stale
+from social_media.models import Post, Comment, Hashtag, ScheduledPost
 from social_media.paginators import paginate_queryset
 
 
+@extend_schema_field(
+    {
+        "type": "object",
+        "nullable": True,
+        "additionalProperties": {
+            "type": "object",
+            "additionalProperties": {"type": "string", "format": "uri"},
+        },
+    }
+)
+class MediaVariantsField(serializers.Field):
+    """URLs of resized image variants as {<size>: {<format>: <url>}} of the
+    image stored in 'file_field'. Every size links to the original image
+    until variants are generated. Null if there is no image"""
+
+    def __init__(self, file_field: str, **kwargs):
+        self.file_field = file_field
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return getattr(instance, self.file_field), super().get_attribute(
+            instance
+        )
+
+    def get_url(self, name: str) -> str:
+        url = default_storage.url(name)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def to_representation(self, value):
+        field_file, variants = value
+
+        if not field_file:
+            return None
+
+        if variants_are_stale(field_file, variants):
+            _, extension = os.path.splitext(field_file.name)
+            url = self.get_url(field_file.name)
+            return {
+                size: {extension.lstrip(".").lower(): url}
+                for size in settings.MEDIA_VARIANT_WIDTHS
+            }
+
+        return {
+            size: {
+                extension: self.get_url(name)
+                for extension, name in names.items()
+            }
+            for size, names in variants.items()
+            if size != "source"
+        }
+
+
 class UserListSerializer(serializers.ModelSerializer):
+    profile_picture_variants = MediaVariantsField(file_field="profile_picture")
+
     class Meta:
         model = get_user_model()
         fields = (
             "id",
             "username",
             "full_name",
-            "profile_picture",
+            "profile_picture_variants",
             "subscribers_count",
+            "subscriptions_count",
         )
+        read_only_fields = ("subscribers_count", "subscriptions_count")
 
 
 class UserPostSerializer(UserListSerializer):
     class Meta:
         model = get_user_model()
-        fields = ("id", "profile_picture", "full_name", "username")
+        fields = ("id", "profile_picture_variants", "full_name", "username")
 
 
 class UserDetailSerializer(serializers.ModelSerializer):
-    subscribed_to = UserListSerializer(many=True)
-    subscribers = UserListSerializer(many=True)
+    """Carries only counts and links to paginated subscribers and
+    subscriptions. Previews of them are inlined when requested with
+    '?expand=subscribers,subscribed_to'"""
+
+    expand_preview_size = 5
+
+    subscribers_url = serializers.HyperlinkedIdentityField(
+        view_name="social_media:user-subscribers", read_only=True
+    )
+    subscriptions_url = serializers.HyperlinkedIdentityField(
+        view_name="social_media:user-subscriptions", read_only=True
+    )
+    profile_picture_variants = MediaVariantsField(file_field="profile_picture")
 
     class Meta:
         model = get_user_model()
         fields = (
             "id",
             "profile_picture",
+            "profile_picture_variants",
             "username",
             "full_name",
             "bio",
             "location",
             "website",
             "subscribers_count",
-            "subscribers",
-            "subscribed_to",
+            "subscriptions_count",
+            "subscribers_url",
+            "subscriptions_url",
+        )
+        read_only_fields = ("subscribers_count", "subscriptions_count")
+
+    def get_expand(self) -> list[str]:
+        request = self.context.get("request")
+        return request.query_params.get("expand", "").split(",")
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        expand = self.get_expand()
+        previews = {
+            "subscribers": instance.subscribers,
+            "subscribed_to": instance.subscribed_to.all(),
+        }
+
+        for field, queryset in previews.items():
+            if field in expand:
+                data[field] = UserListSerializer(
+                    queryset.order_by("id")[: self.expand_preview_size],
+                    many=True,
+                    context=self.context,
+                ).data
+
+        return data
+
+
+class SubscriptionQueriesMixin:
+    """Subscription writes reporting which rows actually changed, so
+    counters stay exact under concurrent requests"""
+
+    @staticmethod
+    def get_subscription_columns() -> tuple[str, str, str]:
+        """Quoted table and column names of subscriptions through model"""
+        through = get_user_model().subscribed_to.through._meta
+        return tuple(
+            map(
+                connection.ops.quote_name,
+                (
+                    through.db_table,
+                    through.get_field("from_user").column,
+                    through.get_field("to_user").column,
+                ),
+            )
         )
 
+    def insert_subscriptions(self, user, user_ids) -> list[int]:
+        """Insert subscriptions with a single 'INSERT ... ON CONFLICT DO
+        NOTHING'. Returns ids of users actually subscribed to, rows
+        inserted by concurrent requests are not counted twice"""
+        if not user_ids:
+            return []
+
+        table, from_column, to_column = self.get_subscription_columns()
+        values = ", ".join(["(%s, %s)"] * len(user_ids))
+        params = [
+            value for user_id in user_ids for value in (user.pk, user_id)
+        ]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({from_column}, {to_column}) "
+                f"VALUES {values} ON CONFLICT DO NOTHING "
+                f"RETURNING {to_column}",
+                params,
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+
+    def delete_subscriptions(self, user, user_ids) -> list[int]:
+        """Delete subscriptions with a single DELETE. Returns ids of users
+        actually unsubscribed from"""
+        if not user_ids:
+            return []
+
+        table, from_column, to_column = self.get_subscription_columns()
+        placeholders = ", ".join(["%s"] * len(user_ids))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {from_column} = %s "
+                f"AND {to_column} IN ({placeholders}) RETURNING {to_column}",
+                [user.pk, *user_ids],
+            )
+            return sorted(row[0] for row in cursor.fetchall())
 
-class UserSubscriptionSerializer(serializers.Serializer):
+
+class UserSubscriptionSerializer(
+    SubscriptionQueriesMixin, serializers.Serializer
+):
     subscribe_to = serializers.PrimaryKeyRelatedField(
         queryset=get_user_model().objects.all()
     )
@@ -59,38 +219,111 @@ class UserSubscriptionSerializer(serializers.Serializer):
         request = self.context.get("request")
         action = self.context.get("action")
 
-        user_subscriptions = request.user.subscribed_to.all()
+        is_subscribed = request.user.subscribed_to.filter(
+            pk=subscribe_to.pk
+        ).exists()
 
         if action == "subscribe":
-            if subscribe_to in user_subscriptions:
+            if is_subscribed:
                 raise serializers.ValidationError("Already subscribed")
 
             if subscribe_to == request.user:
                 raise serializers.ValidationError("Wil not subscribe to self")
-        elif (
-            action == "unsubscribe" and subscribe_to not in user_subscriptions
-        ):
+        elif action == "unsubscribe" and not is_subscribed:
             raise serializers.ValidationError("Not subscribed")
 
         return subscribe_to
 
+    @staticmethod
+    def update_counters(user, subscribe_to, delta: int) -> None:
+        User = get_user_model()
+        increment(User, user.pk, "subscriptions_count", delta)
+        increment(User, subscribe_to.pk, "subscribers_count", delta)
+
+    @transaction.atomic
     def perform_action(self, subscribe_to, request):
         action = self.context.get("action")
 
         if action == "subscribe":
-            request.user.subscribed_to.add(subscribe_to)
+            changed = self.insert_subscriptions(
+                request.user, [subscribe_to.pk]
+            )
+            self.update_counters(request.user, subscribe_to, len(changed))
             return {
                 "action": "subscribe",
                 "message": "Subscribed successfully.",
             }
         elif action == "unsubscribe":
-            request.user.subscribed_to.remove(subscribe_to)
+            changed = self.delete_subscriptions(
+                request.user, [subscribe_to.pk]
+            )
+            self.update_counters(request.user, subscribe_to, -len(changed))
             return {
                 "action": "unsubscribe",
                 "message": "Unsubscribed successfully.",
             }
 
 
+class BulkSubscriptionSerializer(
+    SubscriptionQueriesMixin, serializers.Serializer
+):
+    users = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.BULK_SUBSCRIPTION_MAX_USERS,
+    )
+
+    def validate_users(self, users):
+        """Check that all users exist with a single query"""
+        request = self.context.get("request")
+        users = set(users) - {request.user.id}
+        existing = set(
+            get_user_model()
+            .objects.filter(id__in=users)
+            .values_list("id", flat=True)
+        )
+
+        if users - existing:
+            raise serializers.ValidationError(
+                f"Users not found: {sorted(users - existing)}"
+            )
+
+        return users
+
+    @staticmethod
+    def update_counters(user, user_ids, delta: int) -> None:
+        User = get_user_model()
+        increment(User, user.pk, "subscriptions_count", delta * len(user_ids))
+        increment_many(User, user_ids, "subscribers_count", delta)
+
+    @transaction.atomic
+    def perform_action(self, users, request):
+        """Subscribe to/unsubscribe from users that are not/are in user's
+        subscriptions. Returns ids of users whose subscription changed"""
+        action = self.context.get("action")
+        Subscription = get_user_model().subscribed_to.through
+        subscribed = set(
+            Subscription.objects.filter(
+                from_user=request.user, to_user__in=users
+            ).values_list("to_user_id", flat=True)
+        )
+
+        if action == "subscribe":
+            changed = self.insert_subscriptions(
+                request.user, sorted(users - subscribed)
+            )
+            self.update_counters(request.user, changed, 1)
+            message = f"Subscribed to {len(changed)} users."
+        else:
+            changed = self.delete_subscriptions(
+                request.user, sorted(subscribed)
+            )
+            self.update_counters(request.user, changed, -1)
+            message = f"Unsubscribed from {len(changed)} users."
+
+        return {"action": action, "message": message, "users": changed}
+
+
 def can_edit(obj, minutes_to_edit=5):
     """Returns True if Post/Comment was created less than 'minutes_to_edit'
     minutes ago"""
@@ -110,7 +343,9 @@ class RestrictUpdateMixin:
         """Allow update only for 5 minutes after Comment creation"""
         # Validate if the Comment can be edited
         EditableValidator()(instance)
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        invalidate_post(instance)
+        return instance
 
 
 class CommentSerializer(RestrictUpdateMixin, serializers.ModelSerializer):
@@ -125,6 +360,7 @@ class CommentListSerializer(serializers.ModelSerializer):
     url = serializers.HyperlinkedIdentityField(
         many=False, view_name="social_media:comment-detail", read_only=True
     )
+    media_variants = MediaVariantsField(file_field="media")
 
     class Meta:
         model = Comment
@@ -132,11 +368,12 @@ class CommentListSerializer(serializers.ModelSerializer):
             "id",
             "created_at",
             "text",
-            "media",
+            "media_variants",
             "user",
             "likes_count",
             "url",
         )
+        read_only_fields = ("likes_count",)
 
 
 class PostSerializer(RestrictUpdateMixin, serializers.ModelSerializer):
@@ -147,39 +384,76 @@ class PostSerializer(RestrictUpdateMixin, serializers.ModelSerializer):
 
 
 class LikeSerializer(serializers.Serializer):
-    def validate(self, attrs):
-        """Check if object is already liked/not liked by user"""
-        obj_id = self.context.get("obj")
-        obj = (Post.objects.get(id=obj_id) if self.context.get("is_post")
-               else Comment.objects.get(id=obj_id))
-        request = self.context.get("request")
-        action = self.context.get("action")
-
-        if request.user in obj.users_liked.all() and action == "like":
-            raise serializers.ValidationError("Already liked")
-        elif request.user not in obj.users_liked.all() and action == "unlike":
-            raise serializers.ValidationError("Not liked")
-
-        return attrs
+    @staticmethod
+    def get_error(message):
+        return serializers.ValidationError(
+            {api_settings.NON_FIELD_ERRORS_KEY: [message]}
+        )
 
+    @transaction.atomic
     def perform_action(self, obj, request):
+        """Like/unlike with a single statement on users_liked table, its
+        row count tells if the object was already liked/not liked by user"""
         action = self.context.get("action")
 
         if action == "unlike":
-            obj.users_liked.remove(request.user)
+            if not obj.remove_like(request.user):
+                raise self.get_error("Not liked")
+
+            increment(type(obj), obj.pk, "likes_count", -1)
             return {"action": "unlike", "message": "Unliked successfully."}
         elif action == "like":
-            obj.users_liked.add(request.user)
+            if not obj.add_like(request.user):
+                raise self.get_error("Already liked")
+
+            increment(type(obj), obj.pk, "likes_count")
             return {"action": "like", "message": "Liked successfully."}
 
 
-class PostScheduleSerializer(PostSerializer):
-    post_date = serializers.DateTimeField()
+class PostSearchSerializer(serializers.Serializer):
+    """Query parameters of Post's 'search' endpoint"""
+
+    q = serializers.CharField(max_length=144)
+    author = serializers.IntegerField(required=False)
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False)
+
+
+class ScheduledPostSerializer(serializers.ModelSerializer):
+    post = serializers.HyperlinkedRelatedField(
+        view_name="social_media:post-detail", read_only=True
+    )
 
     class Meta:
-        model = Post
-        fields = ("id", "created_at", "text", "media", "post_date", "user")
-        read_only_fields = ["user"]
+        model = ScheduledPost
+        fields = (
+            "id",
+            "created_at",
+            "text",
+            "media",
+            "publish_at",
+            "status",
+            "error",
+            "post",
+        )
+        read_only_fields = ("status", "error")
+
+    def validate_publish_at(self, value):
+        if value <= django_timezone.now():
+            raise serializers.ValidationError("Must be in the future.")
+
+        return value
+
+    def validate(self, attrs):
+        if (
+            self.instance
+            and self.instance.status != ScheduledPost.Status.PENDING
+        ):
+            raise serializers.ValidationError(
+                "Only pending posts can be changed."
+            )
+
+        return attrs
 
 
 class PostListSerializer(PostSerializer):
@@ -187,6 +461,7 @@ class PostListSerializer(PostSerializer):
     url = serializers.HyperlinkedIdentityField(
         many=False, read_only=True, view_name="social_media:post-detail"
     )
+    media_variants = MediaVariantsField(file_field="media")
 
     class Meta:
         model = Post
@@ -195,38 +470,22 @@ class PostListSerializer(PostSerializer):
             "created_at",
             "user",
             "text",
-            "media",
+            "media_variants",
             "comments_count",
             "likes_count",
             "url",
         )
+        read_only_fields = ("comments_count", "likes_count")
 
 
-class UserWithPostsSerializer(serializers.HyperlinkedModelSerializer):
-    subscribed_to = UserListSerializer(many=True)
-    subscribers = UserListSerializer(many=True)
+class UserWithPostsSerializer(UserDetailSerializer):
     posts = serializers.SerializerMethodField()
 
-    class Meta:
-        model = get_user_model()
-        fields = (
-            "id",
-            "profile_picture",
-            "username",
-            "full_name",
-            "bio",
-            "location",
-            "website",
-            "subscribers_count",
-            "subscribers",
-            "subscribed_to",
-            "posts",
-        )
+    class Meta(UserDetailSerializer.Meta):
+        fields = UserDetailSerializer.Meta.fields + ("posts",)
 
     def get_posts(self, obj):
-        queryset = obj.posts.prefetch_related(
-            "users_liked", "comments"
-        ).order_by("-created_at")
+        queryset = obj.posts.order_by("-created_at")
         return paginate_queryset(
             PostListSerializer, queryset, self.context.get("request")
         )
@@ -240,6 +499,7 @@ class CommentDetailSerializer(CommentSerializer):
 class PostDetailSerializer(serializers.HyperlinkedModelSerializer):
     user = UserPostSerializer(read_only=True)
     comments = serializers.SerializerMethodField()
+    media_variants = MediaVariantsField(file_field="media")
 
     class Meta:
         model = Post
@@ -249,54 +509,29 @@ class PostDetailSerializer(serializers.HyperlinkedModelSerializer):
             "created_at",
             "text",
             "media",
+            "media_variants",
             "likes_count",
             "comments",
         )
+        read_only_fields = ("likes_count",)
 
     def get_comments(self, obj):
-        queryset = obj.comments.order_by("-created_at")
+        queryset = obj.comments.select_related("user").order_by(
+            "-created_at"
+        )
         return paginate_queryset(
             CommentListSerializer, queryset, self.context.get("request")
         )
 
 
-class TaskSerializer:
-    """Serializer for parsing data to Celery task in Post's 'schedule'
-    endpoint"""
-
-    @staticmethod
-    def get_seconds_from_date(post_date: str) -> int:
-        """Get number of seconds for Celery task countdown from user input in
-        Post's schedule endpoint"""
-        date = datetime.fromisoformat(post_date)
-        time_delta = date - datetime.now()
-        return int(time_delta.total_seconds())
-
-    @staticmethod
-    def create_temp_file(media_file: InMemoryUploadedFile = None) -> str:
-        """Create temporary file for use in the Celery task"""
-        if media_file:
-            return default_storage.save(
-                f"temp/{media_file.name}", ContentFile(media_file.read())
-            )
-
-        return ""
-
-    @staticmethod
-    def serialize_task_data(request) -> Dict[str, Any]:
-        """Returns dict with serialized data"""
-        task_data = {"user_id": request.user.id}
-
-        setattr(request.data, "_mutable", True)
-
-        post_date = request.data.pop("post_date")[0]
-        task_data["countdown"] = TaskSerializer.get_seconds_from_date(
-            post_date
-        )
-
-        media_file = request.data.pop("media")[0]
-        task_data["media_path"] = TaskSerializer.create_temp_file(media_file)
-
-        task_data["request_data"] = request.data
+class HashtagSerializer(serializers.ModelSerializer):
+    uses = serializers.IntegerField(read_only=True)
+    posts = serializers.HyperlinkedIdentityField(
+        view_name="social_media:hashtag-posts",
+        lookup_field="name",
+        read_only=True,
+    )
 
-        return task_data
+    class Meta:
+        model = Hashtag
+        fields = ("name", "uses", "posts")
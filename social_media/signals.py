@@ -0,0 +1,118 @@
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from social_media.cache import invalidate, invalidate_user
+from social_media.counters import increment, increment_many
+from social_media.models import Post, Comment
+from social_media.media import variants_are_stale
+from social_media.profiling import finish_task_profile, start_task_profile
+from social_media.search import update_post_search_vector
+from social_media.tags import index_text
+from social_media.tasks import fan_out_post, generate_media_variants
+from user.authentication import forget_local_user
+
+
+@receiver(post_save, sender=Post)
+def fan_out_created_post(sender, instance, created, **kwargs):
+    """Schedule timeline fan-out for every new Post, including the ones
+    created by Celery tasks"""
+    if created:
+        transaction.on_commit(lambda: fan_out_post.delay(instance.id))
+
+
+@receiver(post_save, sender=Post)
+def update_search_vector(sender, instance, **kwargs):
+    """Keep search_vector of created and edited Posts current"""
+    update_post_search_vector(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def index_hashtags_and_mentions(sender, instance, created, **kwargs):
+    index_text(instance, created)
+
+
+MEDIA_FIELDS = {
+    Post: ("media", "media_variants"),
+    Comment: ("media", "media_variants"),
+    get_user_model(): ("profile_picture", "profile_picture_variants"),
+}
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=get_user_model())
+def schedule_media_variants(sender, instance, **kwargs):
+    """Generate resized variants after an image was uploaded or replaced"""
+    field_name, variants_field = MEDIA_FIELDS[sender]
+
+    if variants_are_stale(
+        getattr(instance, field_name), getattr(instance, variants_field)
+    ):
+        transaction.on_commit(
+            lambda: generate_media_variants.delay(
+                sender._meta.label, instance.pk, field_name, variants_field
+            )
+        )
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop cached responses and authenticated instance of the user on any
+    change: profile edits, password changes and deactivation"""
+    invalidate_user(instance)
+    forget_local_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=get_user_model().subscribed_to.through)
+def update_subscription_counters(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Keep counters and cached profiles current when subscriptions are
+    edited with the ORM, e.g. in the admin. API views write subscriptions
+    with raw SQL, which sends no signals, and update counters themselves"""
+    related_name = "user_set" if reverse else "subscribed_to"
+
+    if action == "pre_clear":
+        pk_set = set(
+            getattr(instance, related_name).values_list("pk", flat=True)
+        )
+        delta = -1
+    elif action in ("post_add", "post_remove"):
+        delta = 1 if action == "post_add" else -1
+    else:
+        return
+
+    if not pk_set:
+        return
+
+    own_field, other_field = (
+        ("subscribers_count", "subscriptions_count")
+        if reverse
+        else ("subscriptions_count", "subscribers_count")
+    )
+    increment(get_user_model(), instance.pk, own_field, delta * len(pk_set))
+    increment_many(get_user_model(), pk_set, other_field, delta)
+    invalidate("user", instance.pk, *pk_set)
+
+
+def is_profiled(task) -> bool:
+    """Eager tasks run inside the profiled request"""
+    return settings.PROFILER_ENABLED and not task.request.is_eager
+
+
+@task_prerun.connect
+def start_task_profiler(sender, task_id, task, **kwargs):
+    if is_profiled(task):
+        start_task_profile(task_id)
+
+
+@task_postrun.connect
+def finish_task_profiler(sender, task_id, task, state=None, **kwargs):
+    if is_profiled(task):
+        finish_task_profile(task_id, task.name, state)
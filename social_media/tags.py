@@ -0,0 +1,132 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from social_media.models import (
+    Comment,
+    Hashtag,
+    HashtagUse,
+    Mention,
+    TrendingHashtag,
+)
+
+HASHTAG_PATTERN = re.compile(r"#(\w+)")
+# '@' must start a word, so e-mail addresses are not mentions
+MENTION_PATTERN = re.compile(r"(?<!\w)@([\w.+-]+)")
+
+
+def parse_hashtags(text: str) -> set[str]:
+    return {name.lower() for name in HASHTAG_PATTERN.findall(text)}
+
+
+def parse_mentions(text: str) -> set[str]:
+    """Usernames mentioned as '@username', without trailing punctuation"""
+    return {name.rstrip(".") for name in MENTION_PATTERN.findall(text)}
+
+
+def exclude_older_uses(queryset, key: str):
+    """HashtagUse or Mention rows which are the newest of their post for
+    the same 'key' (hashtag or user), so every post is listed once, at its
+    latest use"""
+    newer = queryset.model.objects.filter(
+        Q(created_at__gt=OuterRef("created_at"))
+        | Q(created_at=OuterRef("created_at"), id__gt=OuterRef("id")),
+        post=OuterRef("post"),
+        **{key: OuterRef(key)},
+    )
+    return queryset.exclude(Exists(newer))
+
+
+def get_source(obj) -> dict:
+    """HashtagUse and Mention fields pointing to the Post or Comment"""
+    if isinstance(obj, Comment):
+        return {"post_id": obj.post_id, "comment_id": obj.pk}
+
+    return {"post_id": obj.pk, "comment_id": None}
+
+
+@transaction.atomic
+def index_text(obj, created: bool = True) -> None:
+    """Parse hashtags and mentions of a Post or Comment into HashtagUse and
+    Mention index tables, replacing the ones of its previous text"""
+    if not created:
+        HashtagUse.objects.filter(**get_source(obj)).delete()
+        Mention.objects.filter(**get_source(obj)).delete()
+
+    index_texts([obj])
+
+
+@transaction.atomic
+def index_texts(objs) -> None:
+    """Index hashtags and mentions of new Posts or Comments with the same
+    number of queries for any number of objects"""
+    parsed = [
+        (obj, parse_hashtags(obj.text), parse_mentions(obj.text))
+        for obj in objs
+    ]
+    names = set().union(*(hashtags for _, hashtags, _ in parsed))
+    usernames = set().union(*(mentions for _, _, mentions in parsed))
+
+    if names:
+        Hashtag.objects.bulk_create(
+            [Hashtag(name=name) for name in names], ignore_conflicts=True
+        )
+        hashtag_ids = dict(
+            Hashtag.objects.filter(name__in=names).values_list("name", "id")
+        )
+        HashtagUse.objects.bulk_create(
+            [
+                HashtagUse(
+                    hashtag_id=hashtag_ids[name],
+                    created_at=obj.created_at,
+                    **get_source(obj),
+                )
+                for obj, hashtags, _ in parsed
+                for name in hashtags
+            ]
+        )
+
+    if usernames:
+        user_ids = dict(
+            get_user_model()
+            .objects.filter(username__in=usernames)
+            .values_list("username", "id")
+        )
+        Mention.objects.bulk_create(
+            [
+                Mention(
+                    user_id=user_ids[username],
+                    created_at=obj.created_at,
+                    **get_source(obj),
+                )
+                for obj, _, mentions in parsed
+                for username in mentions
+                if username in user_ids
+            ]
+        )
+
+
+@transaction.atomic
+def compute_trending_hashtags(window, limit: int) -> None:
+    """Replace TrendingHashtag rows with 'limit' hashtags used in most Posts
+    within the last 'window'"""
+    now = timezone.now()
+    top = (
+        HashtagUse.objects.filter(created_at__gte=now - window)
+        .values("hashtag")
+        .annotate(uses=Count("post", distinct=True))
+        .order_by("-uses")[:limit]
+    )
+
+    TrendingHashtag.objects.all().delete()
+    TrendingHashtag.objects.bulk_create(
+        [
+            TrendingHashtag(
+                hashtag_id=row["hashtag"], uses=row["uses"], computed_at=now
+            )
+            for row in top
+        ]
+    )
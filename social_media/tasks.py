@@ -1,32 +1,123 @@
 from celery import shared_task
-from django.core.files.base import ContentFile
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
 
-from django.core.files.storage import default_storage, FileSystemStorage
+from social_media import media, scheduling, tags, timeline
+from social_media.cache import invalidate_post, invalidate_user
+from social_media.models import Post
 
-from social_media.serializers import PostSerializer
+
+@shared_task
+def publish_scheduled_posts():
+    """Splits due ScheduledPosts into batches published by parallel
+    'publish_scheduled_batch' tasks, runs periodically with Celery beat.
+    Batches not started until the next run expire, their posts are still
+    pending and get dispatched again"""
+    for batch in scheduling.get_due_batches(
+        settings.SCHEDULED_POSTS_BATCH_SIZE
+    ):
+        publish_scheduled_batch.apply_async(
+            (batch,),
+            expires=settings.SCHEDULED_POSTS_INTERVAL.total_seconds(),
+        )
+
+
+@shared_task
+def publish_scheduled_batch(scheduled_post_ids):
+    """Publishes the ScheduledPosts in one transaction. Returns errors of
+    the ones which failed, keyed by ScheduledPost id"""
+    with transaction.atomic():
+        posts, errors = scheduling.publish_batch(
+            scheduling.claim_posts(scheduled_post_ids)
+        )
+        post_ids = [post.id for post in posts]
+        transaction.on_commit(lambda: fan_out_posts.delay(post_ids))
+
+        for post in posts:
+            if post.media:
+                transaction.on_commit(
+                    lambda post_id=post.id: generate_media_variants.delay(
+                        "social_media.Post", post_id, "media", "media_variants"
+                    )
+                )
+
+    return errors
 
 
-def validate_and_save_serializer(serializer, user_id, media_file=None):
-    serializer.is_valid(raise_exception=True)
-    serializer.save(
-        user_id=user_id, media=media_file
-    ) if media_file else serializer.save(user_id=user_id)
+@shared_task
+def fan_out_post(post_id):
+    """Delivers new Post to timelines of author's subscribers"""
+    post = Post.objects.select_related("user").filter(id=post_id).first()
+
+    if post:
+        timeline.fan_out_post(post)
 
 
-def open_and_read_file(file_path):
-    with default_storage.open(file_path, "rb") as file:
-        return ContentFile(file.read(), name=file_path)
+@shared_task
+def fan_out_posts(post_ids):
+    """Delivers new Posts to timelines of their authors' subscribers"""
+    timeline.fan_out_posts(
+        Post.objects.select_related("user").filter(id__in=post_ids)
+    )
 
 
 @shared_task
-def schedule_post_create(user_id, request_data, media_path):
-    """Validates data and creates Post instance"""
-    storage = FileSystemStorage()
-    serializer = PostSerializer(data=request_data)
+def backfill_timeline(user_id, author_ids):
+    """Adds latest Posts of newly subscribed authors to user's timeline"""
+    for author_id in author_ids:
+        timeline.backfill_timeline(user_id, author_id)
+
+
+@shared_task
+def remove_from_timeline(user_id, author_ids):
+    """Removes Posts of unsubscribed authors from user's timeline"""
+    for author_id in author_ids:
+        timeline.get_timeline().remove_author(user_id, author_id)
+
+
+@shared_task
+def trim_timelines():
+    """Trims home timelines to TIMELINE_MAX_LENGTH newest posts"""
+    timeline.get_timeline().trim()
+
+
+@shared_task
+def compute_trending_hashtags():
+    """Recalculates most used hashtags within TRENDING_HASHTAGS_WINDOW"""
+    tags.compute_trending_hashtags(
+        settings.TRENDING_HASHTAGS_WINDOW, settings.TRENDING_HASHTAGS_LIMIT
+    )
+
+
+@shared_task
+def generate_media_variants(model_label, pk, field_name, variants_field):
+    """Replaces resized variants of the image stored in 'field_name' of the
+    object"""
+    model = apps.get_model(model_label)
+    obj = model.objects.filter(pk=pk).first()
+
+    if obj is None:
+        return
+
+    field_file = getattr(obj, field_name)
+    old_variants = getattr(obj, variants_field)
+
+    if not media.variants_are_stale(field_file, old_variants):
+        return
+
+    variants = media.generate_variants(field_file) if field_file else {}
+    # the image could be replaced while variants were generated
+    updated = model.objects.filter(
+        pk=pk, **{field_name: field_file.name}
+    ).update(**{variants_field: variants})
+
+    if updated:
+        # cached responses still list the old variants
+        if model is get_user_model():
+            invalidate_user(obj)
+        else:
+            invalidate_post(obj)
 
-    if media_path:
-        media_file = open_and_read_file(media_path)
-        validate_and_save_serializer(serializer, user_id, media_file)
-        storage.delete(media_path)
-    else:
-        validate_and_save_serializer(serializer, user_id)
+    media.delete_variants(old_variants if updated else variants)
@@ -1,3 +1,1473 @@
-from django.test import TestCase
+import base64
+import json
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import ExifTags, Image
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from social_media.benchmark import check_budgets, load_budgets, run_benchmark
+from social_media.counters import increment
+from social_media.media import (
+    VARIANT_FORMATS,
+    attach_file,
+    move_file,
+    validate_image_upload,
+)
+from social_media.metrics import get_allowed_networks
+from social_media.profiling import trim_profiles
+from social_media.models import (
+    Comment,
+    HashtagUse,
+    LikedPost,
+    Mention,
+    Post,
+    Profile,
+    ScheduledPost,
+    TimelineEntry,
+)
+from social_media.scheduling import claim_posts, publish_batch
+from social_media.search import autocomplete_users, search_users
+from social_media.seeding import seed_social_graph
+from social_media.serializers import (
+    BulkSubscriptionSerializer,
+    UserSubscriptionSerializer,
+)
+from social_media.tags import parse_hashtags, parse_mentions
+from social_media.tasks import generate_media_variants
+from social_media.throttling import (
+    ScopedSlidingWindowThrottle,
+    SlidingWindowRateThrottle,
+)
+from social_media.timeline import (
+    DatabaseTimeline,
+    RedisTimeline,
+    pull_popular_posts,
+)
+
+USER_LIST_URL = reverse("social_media:user-list")
+
+
+def user_detail_url(user_id):
+    return reverse("social_media:user-detail", args=[user_id])
+
+
+def user_with_posts_url(user_id):
+    return reverse("social_media:user-with-posts", args=[user_id])
+
+
+def post_detail_url(post_id):
+    return reverse("social_media:post-detail", args=[post_id])
+
+
+def user_subscribers_url(user_id):
+    return reverse("social_media:user-subscribers", args=[user_id])
+
+
+def post_action_url(post_id, action):
+    return reverse(f"social_media:post-{action}", args=[post_id])
+
+
+def comment_detail_url(comment_id):
+    return reverse("social_media:comment-detail", args=[comment_id])
+
+
+def comment_action_url(comment_id, action):
+    return reverse(f"social_media:comment-{action}", args=[comment_id])
+
+
+def hashtag_posts_url(name):
+    return reverse("social_media:hashtag-posts", args=[name])
+
+
+def scheduled_post_detail_url(scheduled_post_id):
+    return reverse(
+        "social_media:scheduledpost-detail", args=[scheduled_post_id]
+    )
+
+
+BULK_SUBSCRIBE_URL = reverse("social_media:user-bulk-subscribe")
+BULK_UNSUBSCRIBE_URL = reverse("social_media:user-bulk-unsubscribe")
+POST_LIST_URL = reverse("social_media:post-list")
+POST_SEARCH_URL = reverse("social_media:post-search")
+MENTIONS_URL = reverse("social_media:post-mentions")
+METRICS_URL = reverse("metrics")
+SCHEDULE_URL = reverse("social_media:post-schedule")
+SCHEDULED_POST_LIST_URL = reverse("social_media:scheduledpost-list")
+LIKED_POSTS_URL = reverse("social_media:post-liked")
+MY_FEED_URL = reverse("social_media:post-subscriptions")
+
+
+def create_user(number, **params):
+    defaults = {
+        "email": f"user{number}@test.com",
+        "username": f"user{number}",
+        "password": "test12345",
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+class UserQueryCountTests(TestCase):
+    """Number of queries of user endpoints must not depend on the number of
+    users or subscriptions"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+
+    def create_follow_graph(self, first, last):
+        users = [create_user(index) for index in range(first, last + 1)]
+
+        for user in users:
+            self.user.subscribed_to.add(user)
+            user.subscribed_to.add(self.user)
+            Post.objects.create(user=user, text="text")
+            Post.objects.create(user=self.user, text="text")
+
+        return users
+
+    def test_user_list(self):
+        self.create_follow_graph(1, 2)
+
+        with self.assertNumQueries(2):
+            self.client.get(USER_LIST_URL)
+
+        self.create_follow_graph(3, 20)
+
+        with self.assertNumQueries(2):
+            self.client.get(USER_LIST_URL)
+
+    def test_user_detail(self):
+        self.create_follow_graph(1, 2)
+
+        with self.assertNumQueries(1):
+            self.client.get(user_detail_url(self.user.id))
+
+        self.create_follow_graph(3, 20)
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            self.client.get(user_detail_url(self.user.id))
+
+    def test_user_detail_expand(self):
+        self.create_follow_graph(1, 20)
+        url = user_detail_url(self.user.id) + "?expand=subscribers"
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.data["subscribers"]), 5)
+        self.assertNotIn("subscribed_to", response.data)
+
+    def test_user_subscribers(self):
+        users = self.create_follow_graph(1, 12)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(user_subscribers_url(self.user.id))
+
+        next_page = self.client.get(response.data["next"])
+        received = [
+            user["id"]
+            for user in response.data["results"] + next_page.data["results"]
+        ]
+
+        self.assertEqual(received, [user.id for user in users])
+        self.assertIsNone(next_page.data["next"])
+
+    def test_user_with_posts(self):
+        self.create_follow_graph(1, 2)
+
+        with self.assertNumQueries(3):
+            self.client.get(user_with_posts_url(self.user.id))
+
+        self.create_follow_graph(3, 20)
+
+        with self.assertNumQueries(3):
+            self.client.get(user_with_posts_url(self.user.id))
+
+    def test_subscribe_updates_counters(self):
+        other = create_user(1)
+
+        self.client.post(
+            reverse("social_media:user-subscribe", args=[other.id])
+        )
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+
+        self.assertEqual(self.user.subscriptions_count, 1)
+        self.assertEqual(other.subscribers_count, 1)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(user=self.user, text="text")
+
+    def test_post_detail_cached(self):
+        self.client.get(post_detail_url(self.post.id))
+
+        with self.assertNumQueries(0):
+            self.client.get(post_detail_url(self.post.id))
+
+    def test_comment_invalidates_post_detail(self):
+        self.client.get(post_detail_url(self.post.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("social_media:post-comment", args=[self.post.id]),
+                {"text": "comment"},
+            )
+
+        response = self.client.get(post_detail_url(self.post.id))
+
+        self.assertEqual(response.data["comments"]["count"], 1)
+
+
+def explain(sql: str) -> str:
+    """Query plan of the SQL. Sequential scans are disabled on PostgreSQL,
+    where small test tables are cheaper to scan than to read by index"""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}")
+        else:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+class IndexUsageTests(TestCase):
+    """Queries of hot endpoints must be served by their indexes"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        users = [create_user(index) for index in range(1, 6)]
+        self.user.subscribed_to.add(*users)
+
+        for user in users + [self.user]:
+            for _ in range(3):
+                post = Post.objects.create(user=user, text="text")
+                TimelineEntry.objects.create(
+                    user=self.user, post=post, created_at=post.created_at
+                )
+                post.users_liked.add(self.user)
+
+                for commenter in users[:3]:
+                    Comment.objects.create(
+                        user=commenter, post=post, text="text"
+                    )
+
+        self.post = post
+
+    def get_plan(self, url: str, table: str) -> str:
+        """Plan of the first ordered query on 'table' made by the
+        endpoint"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+
+        sql = next(
+            query["sql"]
+            for query in queries
+            if f'"{table}"' in query["sql"] and "ORDER BY" in query["sql"]
+        )
+        return explain(sql)
+
+    def test_post_list(self):
+        plan = self.get_plan(POST_LIST_URL, "social_media_post")
+
+        self.assertIn("post_created", plan)
+
+    def test_user_with_posts(self):
+        plan = self.get_plan(
+            user_with_posts_url(self.user.id), "social_media_post"
+        )
+
+        self.assertIn("post_user_created", plan)
+
+    def test_post_detail_comments(self):
+        plan = self.get_plan(
+            post_detail_url(self.post.id), "social_media_comment"
+        )
+
+        self.assertIn("comment_post_created", plan)
+
+    def test_my_feed(self):
+        plan = self.get_plan(MY_FEED_URL, "social_media_timelineentry")
+
+        # read in index order, without sorting the whole timeline
+        self.assertIn("timeline_user_created_post", plan)
+        self.assertNotRegex(plan, "TEMP B-TREE|Sort")
+
+    def test_hashtag_posts(self):
+        plan = self.get_plan(
+            hashtag_posts_url("tag"), "social_media_hashtaguse"
+        )
+
+        self.assertIn("hashtag_use_tag_created", plan)
+        self.assertNotRegex(plan, "TEMP B-TREE|Sort")
+
+    def test_liked_by_user(self):
+        queryset = Post.users_liked.through.objects.filter(
+            user=self.user
+        ).values("post_id")
+
+        self.assertIn("post_users_liked_user", explain(str(queryset.query)))
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        self.users = {
+            username: create_user(index, username=username, full_name=name)
+            for index, (username, name) in enumerate(
+                [
+                    ("johnny_walker_fan", "Walker Fan"),
+                    ("smith", "John Smith"),
+                    ("john", "John"),
+                    ("alice", "Alice"),
+                ]
+            )
+        }
+
+    def search(self, term: str) -> list[str]:
+        return list(
+            search_users(
+                get_user_model().objects.order_by("id"), term
+            ).values_list("username", flat=True)
+        )
+
+    def test_search_by_username_or_full_name(self):
+        self.assertCountEqual(
+            self.search("JOHN"), ["johnny_walker_fan", "smith", "john"]
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "needs pg_trgm")
+    def test_search_ranked_by_similarity(self):
+        self.assertEqual(self.search("john")[0], "john")
+
+    def test_autocomplete_by_prefix_most_subscribed_first(self):
+        users = self.users
+        users["alice"].subscribed_to.add(users["smith"], users["john"])
+        create_user(4).subscribed_to.add(users["john"])
+
+        self.assertEqual(
+            list(
+                autocomplete_users(
+                    get_user_model().objects.all(), "Jo"
+                ).values_list("username", flat=True)
+            ),
+            ["john", "smith", "johnny_walker_fan"],
+        )
+        self.assertFalse(
+            autocomplete_users(get_user_model().objects.all(), "ohn")
+        )
+
+
+@tag("benchmark")
+class EndpointBudgetTests(TestCase):
+    """Every GET endpoint stays within its query budget on a small synthetic
+    graph. Run alone with 'manage.py test --tag benchmark'. Latency depends
+    on the machine, it is checked by 'manage.py benchmark_endpoints'
+    only"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_social_graph(
+            users=30, subscriptions=10, posts=3, comments=2, likes=5
+        )
+
+    def test_endpoints_within_budgets(self):
+        results = run_benchmark(iterations=3)
+
+        self.assertEqual(
+            check_budgets(results, load_budgets(), fields=("queries",)), []
+        )
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.user = create_user(0)
+        self.other = create_user(1)
+        self.post = Post.objects.create(user=self.user, text="text")
+
+    def test_decrement_stops_at_zero(self):
+        increment(Post, self.post.pk, "likes_count", -1)
+        self.post.refresh_from_db()
+
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_reconcile_counters(self):
+        self.post.users_liked.add(self.other)
+        self.user.subscribed_to.add(self.other)
+        Comment.objects.create(user=self.other, post=self.post, text="text")
+        Post.objects.filter(pk=self.post.pk).update(
+            likes_count=5, comments_count=0
+        )
+
+        call_command("reconcile_counters", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.other.subscribers_count, 1)
+
+    def assert_subscription_counters(self, user, subscriptions, subscribers):
+        user.refresh_from_db()
+        self.assertEqual(
+            (user.subscriptions_count, user.subscribers_count),
+            (subscriptions, subscribers),
+        )
+
+    def test_subscribe_counts_only_changed_rows(self):
+        # row inserted by a concurrent request after validation
+        get_user_model().subscribed_to.through.objects.create(
+            from_user=self.user, to_user=self.other
+        )
+        serializer = UserSubscriptionSerializer(
+            context={"action": "subscribe"}
+        )
+
+        serializer.perform_action(self.other, mock.Mock(user=self.user))
+
+        self.assert_subscription_counters(self.user, 0, 0)
+        self.assert_subscription_counters(self.other, 0, 0)
+
+    def test_orm_subscription_edits_update_counters(self):
+        third = create_user(2)
+
+        self.user.subscribed_to.set([self.other, third])
+        self.assert_subscription_counters(self.user, 2, 0)
+        self.assert_subscription_counters(self.other, 0, 1)
+
+        self.other.user_set.remove(self.user)
+        self.assert_subscription_counters(self.user, 1, 0)
+        self.assert_subscription_counters(self.other, 0, 0)
+
+        self.user.subscribed_to.clear()
+        self.assert_subscription_counters(self.user, 0, 0)
+        self.assert_subscription_counters(third, 0, 0)
+
+
+def encode_cursor(position: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        self.posts = [
+            Post.objects.create(user=self.user, text="text") for _ in range(25)
+        ]
+
+    def get_all_pages(self) -> list[int]:
+        received = []
+        url = POST_LIST_URL + "?pagination=cursor"
+
+        while url:
+            response = self.client.get(url)
+            received += [post["id"] for post in response.data["results"]]
+            url = response.data["next"]
+
+        return received
+
+    def test_next_links_cover_all_posts(self):
+        self.assertEqual(
+            self.get_all_pages(), [post.id for post in reversed(self.posts)]
+        )
+
+    def test_ties_on_created_at(self):
+        Post.objects.update(created_at=self.posts[0].created_at)
+
+        self.assertEqual(
+            self.get_all_pages(), [post.id for post in reversed(self.posts)]
+        )
+
+    def test_invalid_cursors(self):
+        for cursor in (
+            "not-base64!",
+            encode_cursor({"a": 1}),
+            encode_cursor(["2026-01-01T00:00:00+00:00"]),
+            encode_cursor(["not-a-date", "x"]),
+            encode_cursor(["2026-01-01T00:00:00+00:00", "x"]),
+            encode_cursor([None, 1]),
+        ):
+            response = self.client.get(
+                POST_LIST_URL, {"pagination": "cursor", "cursor": cursor}
+            )
+
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class PostSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.other = create_user(1)
+        self.client.force_authenticate(self.user)
+
+    def search(self, **params) -> list[int]:
+        response = self.client.get(POST_SEARCH_URL, {"q": "cats", **params})
+        self.assertEqual(response.status_code, 200)
+        return [post["id"] for post in response.data["results"]]
+
+    def test_filter_by_author_and_dates(self):
+        old = Post.objects.create(user=self.user, text="cats")
+        Post.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+        own = Post.objects.create(user=self.user, text="cats")
+        other = Post.objects.create(user=self.other, text="cats")
+        Post.objects.create(user=self.other, text="dogs")
+        middle = (timezone.now() - timedelta(days=5)).isoformat()
+
+        self.assertEqual(self.search(), [other.id, own.id, old.id])
+        self.assertEqual(self.search(author=self.other.id), [other.id])
+        self.assertEqual(self.search(date_from=middle), [other.id, own.id])
+        self.assertEqual(self.search(date_to=middle), [old.id])
+
+    @skipUnless(connection.vendor == "postgresql", "needs tsvector")
+    def test_most_relevant_first(self):
+        relevant = Post.objects.create(user=self.user, text="cats cats cats")
+        recent = Post.objects.create(user=self.user, text="cats and dogs")
+
+        self.assertEqual(self.search(), [relevant.id, recent.id])
+
+    def test_cursor_pages_cover_all_results(self):
+        posts = [
+            Post.objects.create(user=self.user, text="cats") for _ in range(25)
+        ]
+        Post.objects.update(created_at=posts[0].created_at)
+        received = []
+        url = POST_SEARCH_URL + "?q=cats"
+
+        while url:
+            response = self.client.get(url)
+            received += [post["id"] for post in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(received, [post.id for post in reversed(posts)])
+
+
+class DatabaseTimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        author = create_user(1)
+        self.posts = [
+            Post.objects.create(user=author, text="text") for _ in range(25)
+        ]
+        DatabaseTimeline().add(self.posts, [self.user.id])
+
+    def test_feed_cursor_pages_follow_timeline(self):
+        Post.objects.update(created_at=self.posts[0].created_at)
+        TimelineEntry.objects.update(created_at=self.posts[0].created_at)
+        received = []
+        url = MY_FEED_URL + "?pagination=cursor"
+
+        while url:
+            response = self.client.get(url)
+            received += [post["id"] for post in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(received, [post.id for post in reversed(self.posts)])
+
+    @override_settings(TIMELINE_MAX_LENGTH=10)
+    def test_trim_keeps_newest_entries(self):
+        other = create_user(2)
+        DatabaseTimeline().add(self.posts[:5], [other.id])
+
+        DatabaseTimeline().trim()
+
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(user=self.user)
+                .order_by("-created_at", "-post_id")
+                .values_list("post_id", flat=True)
+            ),
+            [post.id for post in reversed(self.posts)][:10],
+        )
+        self.assertEqual(TimelineEntry.objects.filter(user=other).count(), 5)
+
+    def test_add_inserts_in_batches(self):
+        other = create_user(2)
+        TimelineEntry.objects.all().delete()
+        timeline = DatabaseTimeline()
+        timeline.batch_size = 20
+
+        with self.assertNumQueries(3):
+            timeline.add(iter(self.posts), [self.user.id, other.id])
+
+        self.assertEqual(TimelineEntry.objects.count(), 50)
+
+    @override_settings(TIMELINE_FANOUT_MAX_SUBSCRIBERS=1)
+    def test_backfill_skips_popular_authors(self):
+        TimelineEntry.objects.all().delete()
+        popular = create_user(2)
+        popular_post = Post.objects.create(user=popular, text="text")
+        self.user.subscribed_to.add(popular, self.posts[0].user)
+        create_user(3).subscribed_to.add(popular)
+
+        call_command("backfill_timelines", "--batch-size=1", stdout=StringIO())
+
+        post_ids = set(
+            TimelineEntry.objects.filter(user=self.user).values_list(
+                "post_id", flat=True
+            )
+        )
+        self.assertEqual(len(post_ids), 25)
+        self.assertNotIn(popular_post.id, post_ids)
+
+
+class TimelinePullTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(0)
+        self.popular = create_user(1)
+        self.user.subscribed_to.add(self.popular)
+
+    def get_timeline_post_ids(self) -> set[int]:
+        return set(TimelineEntry.objects.values_list("post_id", flat=True))
+
+    @override_settings(TIMELINE_FANOUT_MAX_SUBSCRIBERS=0)
+    def test_latest_posts_pulled_without_previous_pull(self):
+        post = Post.objects.create(user=self.popular, text="text")
+
+        pull_popular_posts(self.user)
+
+        self.assertEqual(self.get_timeline_post_ids(), {post.id})
+
+    @override_settings(TIMELINE_FANOUT_MAX_SUBSCRIBERS=0)
+    def test_posts_since_last_pull_pulled_once_per_interval(self):
+        old_post = Post.objects.create(user=self.popular, text="text")
+        Post.objects.filter(pk=old_post.pk).update(
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+        cache.set(
+            f"timeline-pull:{self.user.id}",
+            timezone.now() - timedelta(hours=1),
+        )
+        new_post = Post.objects.create(user=self.popular, text="text")
+
+        pull_popular_posts(self.user)
+        Post.objects.create(user=self.popular, text="text")
+        pull_popular_posts(self.user)
+
+        self.assertEqual(self.get_timeline_post_ids(), {new_post.id})
+
+    def test_posts_of_fanned_out_authors_not_pulled(self):
+        Post.objects.create(user=self.popular, text="text")
+
+        pull_popular_posts(self.user)
+
+        self.assertFalse(TimelineEntry.objects.exists())
+
+
+@override_settings(TIMELINE_MAX_LENGTH=10)
+class RedisTimelineTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch("redis.Redis.from_url")
+        self.client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.timeline = RedisTimeline()
+        self.user = create_user(0)
+        self.posts = [
+            Post.objects.create(user=self.user, text="text") for _ in range(3)
+        ]
+
+    def test_add_scores_posts_by_creation_time_and_trims(self):
+        self.timeline.add(self.posts, [1, 2])
+
+        pipe = self.client.pipeline.return_value.__enter__.return_value
+        mapping = {post.id: post.created_at.timestamp() for post in self.posts}
+        pipe.zadd.assert_has_calls(
+            [
+                mock.call("timeline:1", mapping),
+                mock.call("timeline:2", mapping),
+            ]
+        )
+        pipe.zremrangebyrank.assert_called_with("timeline:2", 0, -11)
+        pipe.execute.assert_called_once()
+
+    def test_feed_ordered_by_post_creation_time(self):
+        Post.objects.filter(pk=self.posts[0].pk).update(
+            created_at=timezone.now() + timedelta(minutes=1)
+        )
+        self.client.zrevrange.return_value = [
+            str(post.id).encode() for post in self.posts[:2]
+        ]
+
+        feed = self.timeline.filter_feed(Post.objects.all(), self.user)
+
+        self.client.zrevrange.assert_called_once_with(
+            f"timeline:{self.user.id}", 0, 9
+        )
+        self.assertEqual(list(feed), [self.posts[0], self.posts[1]])
+
+
+def image_content(width, height, orientation=None) -> ContentFile:
+    buffer = BytesIO()
+    exif = Image.Exif()
+
+    if orientation:
+        exif[ExifTags.Base.Orientation] = orientation
+
+    Image.new("RGB", (width, height)).save(buffer, "JPEG", exif=exif)
+    return ContentFile(buffer.getvalue(), name="image.jpg")
+
+
+class MediaVariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(0)
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        media_settings = self.settings(MEDIA_ROOT=self.media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def create_post(self, content):
+        return Post.objects.create(user=self.user, text="text", media=content)
+
+    def generate(self, post):
+        generate_media_variants(
+            "social_media.Post", post.id, "media", "media_variants"
+        )
+        post.refresh_from_db()
+
+    def test_variants_resized_without_exif(self):
+        # rotated by 90 degrees, so the variants are portrait
+        post = self.create_post(image_content(3000, 1500, orientation=6))
+
+        self.generate(post)
+
+        self.assertEqual(post.media_variants["source"], post.media.name)
+
+        for size, width in settings.MEDIA_VARIANT_WIDTHS.items():
+            self.assertEqual(
+                set(post.media_variants[size]), set(VARIANT_FORMATS)
+            )
+
+            for name in post.media_variants[size].values():
+                with default_storage.open(name) as file:
+                    image = Image.open(file)
+                    self.assertEqual(image.size, (width, width * 2))
+                    self.assertFalse(image.getexif())
+
+    def test_stale_variants_deleted_when_image_replaced(self):
+        post = self.create_post(image_content(400, 400))
+        self.generate(post)
+        old_variants = post.media_variants
+
+        post.media = image_content(400, 400)
+        post.save()
+        self.generate(post)
+
+        self.assertEqual(post.media_variants["source"], post.media.name)
+
+        for size, names in old_variants.items():
+            if size != "source":
+                for name in names.values():
+                    self.assertFalse(default_storage.exists(name))
+
+    def test_original_image_listed_until_variants_generated(self):
+        post = self.create_post(image_content(400, 400))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(POST_LIST_URL)
+
+        url = response.wsgi_request.build_absolute_uri(post.media.url)
+        self.assertEqual(
+            response.data["results"][0]["media_variants"],
+            {size: {"jpg": url} for size in settings.MEDIA_VARIANT_WIDTHS},
+        )
+
+    def test_backfill_queues_images_without_variants(self):
+        post = self.create_post(image_content(400, 400))
+        self.generate(self.create_post(image_content(400, 400)))
+        Post.objects.create(user=self.user, text="text")
+
+        with mock.patch(
+            "social_media.management.commands.backfill_media_variants"
+            ".generate_media_variants"
+        ) as task:
+            call_command("backfill_media_variants", stdout=StringIO())
+
+        task.delay.assert_called_once_with(
+            "social_media.Post", post.id, "media", "media_variants"
+        )
+
+
+@override_settings(MEDIA_MAX_UPLOAD_SIZE=1000, MEDIA_MAX_IMAGE_PIXELS=10000)
+class UploadTests(TestCase):
+    def setUp(self):
+        self.user = create_user(0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        media_settings = self.settings(MEDIA_ROOT=self.media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def test_oversize_upload_rejected_with_json(self):
+        response = self.client.post(
+            POST_LIST_URL,
+            {"text": "text", "media": ContentFile(b"0" * 2000, "a.jpg")},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("MEDIA_MAX_UPLOAD_SIZE", response.data["detail"])
+        self.assertFalse(Post.objects.exists())
+
+    def test_validate_image_upload(self):
+        image = image_content(100, 100)
+        image.seek(10)
+
+        validate_image_upload(image)
+
+        self.assertEqual(image.tell(), 10)
+
+        with self.assertRaisesMessage(ValidationError, "max resolution"):
+            validate_image_upload(image_content(101, 100))
+
+        with self.assertRaisesMessage(ValidationError, "max size"):
+            validate_image_upload(ContentFile(b"0" * 1001))
+
+    def test_attach_file_moves_to_upload_path(self):
+        name = default_storage.save("uploads/image.jpg", ContentFile(b"0"))
+        post = Post(user=self.user, text="text")
+
+        attach_file(post, "media", name)
+
+        self.assertTrue(
+            post.media.name.startswith("uploads/users/user0/posts/post-")
+        )
+        self.assertTrue(default_storage.exists(post.media.name))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_move_file_keeps_existing_file(self):
+        name = default_storage.save("uploads/a.jpg", ContentFile(b"a"))
+        existing = default_storage.save("uploads/b.jpg", ContentFile(b"b"))
+
+        new_name = move_file(name, existing)
+
+        self.assertNotEqual(new_name, existing)
+        self.assertFalse(default_storage.exists(name))
+
+        with default_storage.open(new_name) as file:
+            self.assertEqual(file.read(), b"a")
+
+        with default_storage.open(existing) as file:
+            self.assertEqual(file.read(), b"b")
+
+
+class LikeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(user=create_user(1), text="text")
+        self.comment = Comment.objects.create(
+            user=self.user, post=self.post, text="text"
+        )
+
+    def test_add_like_inserts_once(self):
+        self.assertTrue(self.post.add_like(self.user))
+        self.assertFalse(self.post.add_like(self.user))
+        self.assertTrue(self.comment.add_like(self.user))
+
+        self.assertEqual(list(self.post.users_liked.all()), [self.user])
+        self.assertEqual(list(self.comment.users_liked.all()), [self.user])
+
+    def test_like_and_unlike_post(self):
+        url = post_action_url(self.post.id, "like")
+
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+        url = post_action_url(self.post.id, "unlike")
+
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertFalse(self.post.users_liked.exists())
+
+    def test_like_comment(self):
+        response = self.client.post(
+            comment_action_url(self.comment.id, "like")
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 1)
+        self.assertTrue(self.comment.users_liked.filter(pk=self.user.pk))
+
+
+class BulkSubscriptionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        self.users = [create_user(index) for index in range(1, 4)]
+
+    def assert_counters(self, subscriptions: int, subscribers: list[int]):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.subscriptions_count, subscriptions)
+
+        for user, count in zip(self.users, subscribers):
+            user.refresh_from_db()
+            self.assertEqual(user.subscribers_count, count)
+
+    def test_bulk_subscribe_and_unsubscribe(self):
+        user_ids = [user.id for user in self.users]
+        response = self.client.post(
+            BULK_SUBSCRIBE_URL, {"users": user_ids[:2]}, format="json"
+        )
+
+        self.assertEqual(response.data["users"], user_ids[:2])
+        self.assert_counters(2, [1, 1, 0])
+
+        response = self.client.post(
+            BULK_SUBSCRIBE_URL, {"users": user_ids}, format="json"
+        )
+
+        self.assertEqual(response.data["users"], user_ids[2:])
+        self.assert_counters(3, [1, 1, 1])
+
+        response = self.client.post(
+            BULK_UNSUBSCRIBE_URL, {"users": user_ids[1:]}, format="json"
+        )
+
+        self.assertEqual(response.data["users"], user_ids[1:])
+        self.assert_counters(1, [1, 0, 0])
+
+    def test_drifted_counters_stay_non_negative(self):
+        # subscription without counter updates, e.g. restored from a dump
+        get_user_model().subscribed_to.through.objects.create(
+            from_user=self.user, to_user=self.users[0]
+        )
+
+        response = self.client.post(
+            BULK_UNSUBSCRIBE_URL, {"users": [self.users[0].id]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assert_counters(0, [0, 0, 0])
+
+    def test_rows_inserted_concurrently_are_not_counted(self):
+        self.user.subscribed_to.add(self.users[0])
+        serializer = BulkSubscriptionSerializer()
+
+        self.assertEqual(
+            serializer.insert_subscriptions(
+                self.user, [user.id for user in self.users]
+            ),
+            [user.id for user in self.users[1:]],
+        )
+        self.assertEqual(
+            serializer.delete_subscriptions(
+                self.user, [self.users[0].id, 999]
+            ),
+            [self.users[0].id],
+        )
+
+
+class LikedPostTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        author = create_user(1)
+        self.posts = [
+            Post.objects.create(user=author, text="text") for _ in range(2)
+        ]
+        self.comment = Comment.objects.create(
+            user=self.user, post=self.posts[0], text="text"
+        )
+
+    def get_liked_posts(self) -> list[int]:
+        response = self.client.get(LIKED_POSTS_URL)
+        return [post["id"] for post in response.data["results"]]
+
+    def test_most_recently_liked_first(self):
+        for post in self.posts:
+            self.client.post(post_action_url(post.id, "like"))
+
+        self.assertEqual(
+            self.get_liked_posts(), [self.posts[1].id, self.posts[0].id]
+        )
+
+        self.client.post(comment_action_url(self.comment.id, "like"))
+
+        self.assertEqual(
+            self.get_liked_posts(), [self.posts[0].id, self.posts[1].id]
+        )
+
+    def test_post_kept_while_comment_is_liked(self):
+        post = self.posts[0]
+        self.client.post(post_action_url(post.id, "like"))
+        self.client.post(comment_action_url(self.comment.id, "like"))
+        self.client.post(post_action_url(post.id, "unlike"))
+
+        self.assertEqual(self.get_liked_posts(), [post.id])
+
+        self.client.post(comment_action_url(self.comment.id, "unlike"))
+
+        self.assertEqual(self.get_liked_posts(), [])
+
+    def test_deleted_comment_is_forgotten(self):
+        other = create_user(2)
+        self.comment.add_like(other)
+        LikedPost.record(other, self.posts[0].id)
+        self.client.post(comment_action_url(self.comment.id, "like"))
+
+        response = self.client.delete(comment_detail_url(self.comment.id))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_liked_posts(), [])
+        self.assertFalse(LikedPost.objects.exists())
+
+    def test_post_liked_by_user_survives_comment_deletion(self):
+        post = self.posts[0]
+        self.client.post(post_action_url(post.id, "like"))
+        self.client.post(comment_action_url(self.comment.id, "like"))
+
+        self.client.delete(comment_detail_url(self.comment.id))
+
+        self.assertEqual(self.get_liked_posts(), [post.id])
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        self.author = create_user(1)
+
+    def test_parse_hashtags(self):
+        self.assertEqual(
+            parse_hashtags("#Django and #django, #api!"), {"django", "api"}
+        )
+
+    def test_parse_mentions(self):
+        self.assertEqual(
+            parse_mentions("@user0, hi @user.1. Mail a@example.com"),
+            {"user0", "user.1"},
+        )
+
+    def test_reindexed_on_edit(self):
+        post = Post.objects.create(user=self.author, text="#old @user0")
+        post.text = "#new"
+        post.save()
+
+        self.assertEqual(
+            list(
+                HashtagUse.objects.filter(post=post).values_list(
+                    "hashtag__name", flat=True
+                )
+            ),
+            ["new"],
+        )
+        self.assertFalse(Mention.objects.filter(post=post).exists())
+
+    def test_hashtag_posts_by_latest_use(self):
+        posts = [
+            Post.objects.create(user=self.author, text=f"#tag {index}")
+            for index in range(12)
+        ]
+        Comment.objects.create(user=self.user, post=posts[0], text="#Tag")
+
+        received = []
+        url = hashtag_posts_url("TAG")
+
+        while url:
+            response = self.client.get(url)
+            received += [post["id"] for post in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(
+            received,
+            [posts[0].id] + [post.id for post in reversed(posts[1:])],
+        )
+
+    def test_mentions(self):
+        first = Post.objects.create(user=self.author, text="@user0")
+        second = Post.objects.create(user=self.author, text="@user0 again")
+        Comment.objects.create(user=self.author, post=first, text="@user0")
+        Post.objects.create(user=self.author, text="mail user0@test.com")
+
+        response = self.client.get(MENTIONS_URL)
+
+        self.assertEqual(
+            [post["id"] for post in response.data["results"]],
+            [first.id, second.id],
+        )
+
+
+class ScheduledPostTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        self.publish_at = timezone.now() + timedelta(hours=1)
+
+    def schedule(self, **params) -> ScheduledPost:
+        defaults = {
+            "user": self.user,
+            "text": "text",
+            "publish_at": self.publish_at,
+        }
+        defaults.update(params)
+        return ScheduledPost.objects.create(**defaults)
+
+    def publish(self, scheduled_posts) -> tuple[list, dict]:
+        with transaction.atomic():
+            return publish_batch(
+                claim_posts([obj.id for obj in scheduled_posts])
+            )
+
+    def test_schedule(self):
+        response = self.client.post(
+            SCHEDULE_URL, {"text": "later", "publish_at": self.publish_at}
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["status"], "pending")
+        self.assertTrue(
+            ScheduledPost.objects.filter(
+                user=self.user, text="later", publish_at=self.publish_at
+            ).exists()
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_publish_at_must_be_in_future(self):
+        response = self.client.post(
+            SCHEDULED_POST_LIST_URL,
+            {"text": "text", "publish_at": timezone.now()},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("publish_at", response.data)
+
+    def test_list_only_own_posts(self):
+        own = self.schedule()
+        self.schedule(user=create_user(1))
+
+        response = self.client.get(SCHEDULED_POST_LIST_URL)
+
+        self.assertEqual(
+            [obj["id"] for obj in response.data["results"]], [own.id]
+        )
+
+    def test_edit_and_cancel_pending(self):
+        scheduled_post = self.schedule()
+        url = scheduled_post_detail_url(scheduled_post.id)
+
+        response = self.client.patch(url, {"text": "edited"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["text"], "edited")
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(ScheduledPost.objects.exists())
+
+    def test_published_cannot_be_edited(self):
+        scheduled_post = self.schedule(status=ScheduledPost.Status.PUBLISHED)
+
+        response = self.client.patch(
+            scheduled_post_detail_url(scheduled_post.id), {"text": "edited"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_publish_due_posts(self):
+        due = self.schedule(publish_at=timezone.now())
+        later = self.schedule()
+        invalid = self.schedule(publish_at=timezone.now(), text="")
+
+        with self.assertLogs("social_media.scheduling", "WARNING"):
+            posts, errors = self.publish([due, later, invalid])
+
+        self.assertEqual([post.text for post in posts], ["text"])
+        self.assertEqual(list(errors), [invalid.id])
+        due.refresh_from_db()
+        self.assertEqual(due.status, ScheduledPost.Status.PUBLISHED)
+        self.assertEqual(due.post, posts[0])
+        later.refresh_from_db()
+        self.assertEqual(later.status, ScheduledPost.Status.PENDING)
+        invalid.refresh_from_db()
+        self.assertEqual(invalid.status, ScheduledPost.Status.FAILED)
+
+    def test_media_restored_when_publishing_fails(self):
+        with tempfile.TemporaryDirectory() as media_root:
+            with self.settings(MEDIA_ROOT=media_root):
+                name = default_storage.save(
+                    "uploads/scheduled.png", ContentFile(b"image")
+                )
+                scheduled_post = self.schedule(
+                    publish_at=timezone.now(), media=name
+                )
+
+                with mock.patch(
+                    "social_media.scheduling.index_texts",
+                    side_effect=RuntimeError,
+                ):
+                    with self.assertRaises(RuntimeError):
+                        self.publish([scheduled_post])
+
+                self.assertTrue(default_storage.exists(name))
+
+        scheduled_post.refresh_from_db()
+        self.assertEqual(scheduled_post.status, ScheduledPost.Status.PENDING)
+        self.assertEqual(scheduled_post.media.name, name)
+        self.assertFalse(Post.objects.exists())
+
+
+class MinuteThrottle(SlidingWindowRateThrottle):
+    rate = "4/minute"
+
+    def __init__(self, now: float):
+        super().__init__()
+        self.now = now
+
+    def timer(self):
+        return self.now
+
+    def get_cache_key(self, request, view):
+        return "throttle-test"
+
+
+class SlidingWindowThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def allow(self, now: float, rate: str = "4/minute") -> MinuteThrottle:
+        throttle = MinuteThrottle(now)
+        throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+        throttle.allowed = throttle.allow_request(None, None)
+        return throttle
+
+    def test_window_boundary(self):
+        for _ in range(4):
+            self.assertTrue(self.allow(0).allowed)
+
+        self.assertFalse(self.allow(59).allowed)
+        # the previous window still fully counts at its end
+        self.assertFalse(self.allow(60).allowed)
+        # half of it counts half way through the next window
+        self.assertTrue(self.allow(90).allowed)
+        self.assertTrue(self.allow(90).allowed)
+        self.assertFalse(self.allow(90).allowed)
+
+    def test_wait(self):
+        for _ in range(4):
+            self.allow(0)
+
+        throttle = self.allow(0)
+
+        self.assertFalse(throttle.allowed)
+        self.assertEqual(throttle.wait(), 75)
+        self.assertFalse(self.allow(74).allowed)
+        self.assertTrue(self.allow(75).allowed)
+
+    def test_zero_rate(self):
+        throttle = self.allow(0, rate="0/minute")
+
+        self.assertFalse(throttle.allowed)
+        self.assertIsNone(throttle.wait())
+
+
+class ScopedThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(user=create_user(1), text="text")
+        patcher = mock.patch.dict(
+            ScopedSlidingWindowThrottle.THROTTLE_RATES,
+            {"like": "2/minute", "comment": "1/minute"},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_scopes_are_limited_separately(self):
+        like_url = post_action_url(self.post.id, "like")
+        unlike_url = post_action_url(self.post.id, "unlike")
+        comment_url = post_action_url(self.post.id, "comment")
+
+        self.assertEqual(self.client.post(like_url).status_code, 200)
+        self.assertEqual(self.client.post(unlike_url).status_code, 200)
+
+        response = self.client.post(like_url)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertLessEqual(int(response["Retry-After"]), 120)
+
+        response = self.client.post(comment_url, {"text": "text"})
+
+        self.assertLess(response.status_code, 300)
+        self.assertEqual(
+            self.client.post(comment_url, {"text": "text"}).status_code, 429
+        )
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.post = Post.objects.create(user=create_user(0), text="text")
+        get_allowed_networks.cache_clear()
+        self.addCleanup(get_allowed_networks.cache_clear)
+
+    def test_requests_are_counted_by_route(self):
+        labels = {
+            "route": "social_media:post-list",
+            "method": "GET",
+            "status": "200",
+        }
+        before = REGISTRY.get_sample_value("http_requests_total", labels) or 0
+
+        self.client.get(POST_LIST_URL)
+
+        self.assertEqual(
+            REGISTRY.get_sample_value("http_requests_total", labels),
+            before + 1,
+        )
+
+    def test_server_timing(self):
+        url = post_detail_url(self.post.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        timing = response["Server-Timing"]
+        self.assertRegex(
+            timing, rf'db;dur=[\d.]+;desc="{len(queries)} queries"'
+        )
+        self.assertIn('cache;desc="0 hits, 1 misses"', timing)
+        self.assertRegex(timing, r"serializer;dur=[\d.]+, total;dur=[\d.]+")
+
+        response = self.client.get(url)
+
+        self.assertIn(
+            'cache;desc="1 hits, 0 misses"', response["Server-Timing"]
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.0/8", "::1/128"])
+    def test_metrics_only_for_allowed_networks(self):
+        self.assertEqual(
+            self.client.get(METRICS_URL, REMOTE_ADDR="127.0.0.1").status_code,
+            404,
+        )
+
+        response = self.client.get(METRICS_URL, REMOTE_ADDR="10.1.2.3")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"http_requests_total", response.content)
+
+
+@override_settings(
+    PROFILER_ENABLED=True, PROFILER_THRESHOLD=60, PROFILER_SAMPLE_RATE=0
+)
+class ProfilerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.staff = create_user(0, is_staff=True)
+        self.user = create_user(1)
+
+    def get_with_header(self, user=None):
+        headers = {"HTTP_X_PROFILE": "1"}
+
+        if user is not None:
+            headers["HTTP_AUTHORIZATION"] = (
+                f"Bearer {AccessToken.for_user(user)}"
+            )
+
+        response = self.client.get(POST_LIST_URL, {"page": 1}, **headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_header_profiles_staff_requests(self):
+        self.get_with_header(self.staff)
+
+        profile = Profile.objects.get()
+        self.assertEqual(profile.trigger, Profile.Trigger.HEADER)
+        self.assertEqual(profile.name, "social_media:post-list")
+        # cProfile statistics
+        self.assertIn("function calls", profile.stats)
+        self.assertEqual(profile.description, f"GET {POST_LIST_URL} 200")
+
+    def test_header_ignored_for_other_clients(self):
+        self.get_with_header(self.user)
+        self.get_with_header()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer invalid")
+        self.client.get(POST_LIST_URL, HTTP_X_PROFILE="1")
+
+        self.assertFalse(Profile.objects.exists())
+
+    @override_settings(PROFILER_THRESHOLD=0)
+    def test_slow_requests_profiled_by_sampler(self):
+        self.get_with_header(self.user)
+
+        profile = Profile.objects.get()
+        self.assertEqual(profile.trigger, Profile.Trigger.THRESHOLD)
+        self.assertNotIn("function calls", profile.stats)
+
+    @override_settings(PROFILER_MAX_PROFILES=3)
+    def test_trim_profiles(self):
+        profiles = [
+            Profile.objects.create(
+                kind=Profile.Kind.TASK,
+                trigger=Profile.Trigger.THRESHOLD,
+                name="task",
+                duration=1,
+                query_count=0,
+                query_duration=0,
+            )
+            for _ in range(5)
+        ]
+
+        trim_profiles()
+
+        self.assertEqual(list(Profile.objects.order_by("id")), profiles[2:])
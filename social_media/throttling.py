@@ -0,0 +1,92 @@
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """Limits requests in a sliding window, approximated by counters of the
+    current and the previous fixed windows. The previous counter is weighted
+    by the part of the previous window the sliding one still overlaps.
+
+    Counters are changed with atomic cache increments, so with the Redis
+    cache a limit holds across all processes and nodes, and every check
+    costs the same number of round trips whatever the rate. Rejected
+    requests are not counted"""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+
+        if self.key is None:
+            return True
+
+        window, offset = divmod(self.timer(), self.duration)
+        self.elapsed = offset / self.duration
+        current_key = f"{self.key}:{int(window)}"
+
+        self.cache.add(current_key, 0, timeout=self.duration * 2)
+
+        try:
+            self.current = self.cache.incr(current_key)
+        except ValueError:
+            # the counter expired between add and incr
+            self.cache.set(current_key, 1, timeout=self.duration * 2)
+            self.current = 1
+
+        self.previous = self.cache.get(f"{self.key}:{int(window) - 1}", 0)
+
+        estimate = self.previous * (1 - self.elapsed) + self.current
+
+        if estimate <= self.num_requests:
+            return True
+
+        self.cache.decr(current_key)
+        self.current -= 1
+        return False
+
+    def wait(self):
+        """Seconds until the next request fits into the limit, None if no
+        request ever does"""
+        if self.num_requests == 0:
+            return None
+
+        allowed = self.num_requests - self.current - 1
+
+        if allowed >= 0:
+            # the weight of the previous window has to decrease
+            overlap = allowed / self.previous
+            return (1 - overlap - self.elapsed) * self.duration
+
+        # in the next window the current counter becomes the previous one
+        overlap = (self.num_requests - 1) / self.current
+        return (1 - self.elapsed + max(0.0, 1 - overlap)) * self.duration
+
+
+class AnonSlidingWindowThrottle(SlidingWindowRateThrottle, AnonRateThrottle):
+    pass
+
+
+class UserSlidingWindowThrottle(SlidingWindowRateThrottle, UserRateThrottle):
+    pass
+
+
+class ScopedSlidingWindowThrottle(
+    SlidingWindowRateThrottle, ScopedRateThrottle
+):
+    """Limits views and actions with 'throttle_scope' by their scope rate,
+    per user or per IP address of anonymous clients"""
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
@@ -0,0 +1,204 @@
+from collections import defaultdict
+from functools import cache as memoize
+from itertools import islice
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from social_media.models import Post, TimelineEntry
+
+
+class DatabaseTimeline:
+    """Home timelines stored as TimelineEntry rows, trimmed to
+    TIMELINE_MAX_LENGTH newest posts by 'trim'"""
+
+    batch_size = 1000
+
+    def add(self, posts, user_ids) -> None:
+        """Insert entries of every post for every user 'batch_size' rows at
+        a time, so the product of both is never held in memory"""
+        entries = (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.id,
+                created_at=post.created_at,
+            )
+            for post in posts
+            for user_id in user_ids
+        )
+
+        while batch := list(islice(entries, self.batch_size)):
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def remove_author(self, user_id: int, author_id: int) -> None:
+        TimelineEntry.objects.filter(
+            user_id=user_id, post__user_id=author_id
+        ).delete()
+
+    def filter_feed(self, queryset, user):
+        """Posts of the timeline ordered by entry columns, so they are read
+        in order of the (user, -created_at, -post) index"""
+        return (
+            queryset.filter(timeline_entries__user=user)
+            .annotate(
+                feed_created_at=F("timeline_entries__created_at"),
+                feed_post_id=F("timeline_entries__post_id"),
+            )
+            .order_by("-feed_created_at", "-feed_post_id")
+        )
+
+    def trim(self) -> None:
+        """Delete entries older than TIMELINE_MAX_LENGTH newest ones of
+        every timeline which grew longer"""
+        user_ids = (
+            TimelineEntry.objects.values("user_id")
+            .annotate(length=Count("id"))
+            .filter(length__gt=settings.TIMELINE_MAX_LENGTH)
+            .values_list("user_id", flat=True)
+        )
+
+        for user_id in list(user_ids):
+            entries = TimelineEntry.objects.filter(user_id=user_id)
+            oldest_kept = entries.order_by("-created_at", "-post_id")[
+                settings.TIMELINE_MAX_LENGTH - 1
+            ]
+            entries.filter(
+                Q(created_at__lt=oldest_kept.created_at)
+                | Q(
+                    created_at=oldest_kept.created_at,
+                    post_id__lt=oldest_kept.post_id,
+                )
+            ).delete()
+
+
+class RedisTimeline:
+    """Home timelines stored as Redis sorted sets of post ids scored by post
+    creation time, trimmed to TIMELINE_MAX_LENGTH newest posts"""
+
+    key_prefix = "timeline"
+
+    def __init__(self):
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+
+    def get_key(self, user_id: int) -> str:
+        return f"{self.key_prefix}:{user_id}"
+
+    def add(self, posts, user_ids) -> None:
+        mapping = {post.id: post.created_at.timestamp() for post in posts}
+
+        with self.client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                key = self.get_key(user_id)
+                pipe.zadd(key, mapping)
+                pipe.zremrangebyrank(
+                    key, 0, -settings.TIMELINE_MAX_LENGTH - 1
+                )
+            pipe.execute()
+
+    def remove_author(self, user_id: int, author_id: int) -> None:
+        post_ids = list(
+            Post.objects.filter(user_id=author_id)
+            .order_by("-created_at")
+            .values_list("id", flat=True)[: settings.TIMELINE_MAX_LENGTH]
+        )
+
+        if post_ids:
+            self.client.zrem(self.get_key(user_id), *post_ids)
+
+    def filter_feed(self, queryset, user):
+        post_ids = self.client.zrevrange(
+            self.get_key(user.id), 0, settings.TIMELINE_MAX_LENGTH - 1
+        )
+        return (
+            queryset.filter(id__in=[int(post_id) for post_id in post_ids])
+            .annotate(feed_created_at=F("created_at"), feed_post_id=F("id"))
+            .order_by("-feed_created_at", "-feed_post_id")
+        )
+
+    def trim(self) -> None:
+        """Sorted sets are trimmed on every 'add'"""
+
+
+TIMELINE_BACKENDS = {
+    "database": DatabaseTimeline,
+    "redis": RedisTimeline,
+}
+
+
+@memoize
+def get_timeline():
+    return TIMELINE_BACKENDS[settings.TIMELINE_BACKEND]()
+
+
+def get_subscriber_ids(author_id: int):
+    return get_user_model().objects.filter(
+        subscribed_to=author_id
+    ).values_list("id", flat=True)
+
+
+def get_popular_subscriptions(user):
+    """Accounts the user is subscribed to which are too popular for
+    fan-out-on-write"""
+    return user.subscribed_to.filter(
+        subscribers_count__gt=settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS
+    )
+
+
+def fan_out_posts(posts) -> None:
+    """Deliver new posts to timelines of their authors' subscribers, all
+    posts of an author at once. Posts of popular accounts are skipped here
+    and pulled on read instead"""
+    posts_by_author = defaultdict(list)
+
+    for post in posts:
+        if (
+            post.user.subscribers_count
+            <= settings.TIMELINE_FANOUT_MAX_SUBSCRIBERS
+        ):
+            posts_by_author[post.user_id].append(post)
+
+    for author_id, author_posts in posts_by_author.items():
+        get_timeline().add(author_posts, list(get_subscriber_ids(author_id)))
+
+
+def fan_out_post(post: Post) -> None:
+    fan_out_posts([post])
+
+
+def backfill_timeline(user_id: int, author_id: int) -> None:
+    """Add author's latest posts to the timeline of a new subscriber"""
+    posts = Post.objects.filter(user_id=author_id).order_by("-created_at")[
+        : settings.TIMELINE_BACKFILL_POSTS
+    ]
+    get_timeline().add(list(posts), [user_id])
+
+
+def pull_popular_posts(user) -> None:
+    """Fan-out-on-read: copy posts of popular subscriptions published since
+    the last pull into user's timeline. Runs at most once per
+    TIMELINE_PULL_INTERVAL for each user. Users without a pull within
+    TIMELINE_PULL_TIMEOUT get the latest posts again"""
+    key = f"timeline-pull:{user.id}"
+    now = timezone.now()
+    last_pull = cache.get(key)
+
+    if last_pull and (now - last_pull).total_seconds() < (
+        settings.TIMELINE_PULL_INTERVAL
+    ):
+        return
+
+    posts = Post.objects.filter(
+        user__in=get_popular_subscriptions(user)
+    ).order_by("-created_at")
+
+    if last_pull:
+        posts = posts.filter(created_at__gt=last_pull)
+
+    get_timeline().add(
+        list(posts[: settings.TIMELINE_MAX_LENGTH]), [user.id]
+    )
+    cache.set(key, now, timeout=settings.TIMELINE_PULL_TIMEOUT)
@@ -1,12 +1,20 @@
 from rest_framework import routers
 
-from social_media.views import UserViewSet, PostViewSet, CommentViewSet
+from social_media.views import (
+    UserViewSet,
+    PostViewSet,
+    CommentViewSet,
+    HashtagViewSet,
+    ScheduledPostViewSet,
+)
 
 
 view_set_dict = {
     "users": UserViewSet,
     "posts": PostViewSet,
     "comments": CommentViewSet,
+    "hashtags": HashtagViewSet,
+    "scheduled-posts": ScheduledPostViewSet,
 }
 
 router = routers.DefaultRouter()
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     OpenApiParameter,
@@ -14,34 +15,96 @@ from rest_framework.permissions import (
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from social_media.models import Post, Comment
-from social_media.paginators import ListPagination
+from social_media.cache import (
+    get_cached_response,
+    set_cached_response,
+    invalidate,
+    invalidate_post,
+)
+from social_media.counters import increment
+from social_media.metrics import SerializerTimingMixin
+from social_media.models import (
+    Post,
+    Comment,
+    LikedPost,
+    Hashtag,
+    HashtagUse,
+    Mention,
+    ScheduledPost,
+)
+from social_media.paginators import (
+    ListPagination,
+    FeedPagination,
+    UserCursorPagination,
+    KeysetPagination,
+    LikedPostsPagination,
+    PostSearchPagination,
+    TimelinePagination,
+)
 from social_media.permissions import IsOwnerOrReadOnly
 from social_media.serializers import (
     UserListSerializer,
     UserDetailSerializer,
     UserSubscriptionSerializer,
+    BulkSubscriptionSerializer,
     PostSerializer,
     CommentSerializer,
     PostDetailSerializer,
     CommentDetailSerializer,
     PostListSerializer,
-    PostScheduleSerializer,
-    TaskSerializer,
+    PostSearchSerializer,
+    ScheduledPostSerializer,
     UserWithPostsSerializer,
     LikeSerializer,
+    HashtagSerializer,
+)
+from social_media.search import (
+    search_users,
+    autocomplete_users,
+    search_posts,
+)
+from social_media.tasks import (
+    backfill_timeline,
+    remove_from_timeline,
 )
-from social_media.tasks import schedule_post_create
+from social_media.tags import exclude_older_uses
+from social_media.timeline import get_timeline, pull_popular_posts
+
+
+class CachedRetrieveMixin:
+    """Serve 'retrieve' from the response cache, keyed by 'cache_resource',
+    object pk and request URL. Writes invalidate it via social_media.cache"""
+
+    cache_resource = None
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_field]
+        data = get_cached_response(self.cache_resource, pk, request)
+
+        if data is None:
+            response = super().retrieve(request, *args, **kwargs)
+            set_cached_response(
+                self.cache_resource, pk, request, response.data
+            )
+            return response
+
+        return Response(data)
 
 
 class UserViewSet(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet
+    SerializerTimingMixin,
+    CachedRetrieveMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    GenericViewSet,
 ):
-    queryset = get_user_model().objects.prefetch_related(
-        "liked_comments", "liked_posts"
-    )
+    queryset = get_user_model().objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = ListPagination
+    cache_resource = "user"
+    autocomplete_limit = 10
+    # set per action, see ScopedSlidingWindowThrottle
+    throttle_scope = None
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -53,6 +116,9 @@ class UserViewSet(
         if self.action in ["subscribe", "unsubscribe"]:
             return UserSubscriptionSerializer
 
+        if self.action in ["bulk_subscribe", "bulk_unsubscribe"]:
+            return BulkSubscriptionSerializer
+
         return UserListSerializer
 
     def get_queryset(self):
@@ -60,16 +126,14 @@ class UserViewSet(
         user = self.request.query_params.get("user")
         location = self.request.query_params.get("location")
 
-        queryset = self.queryset
-
-        if user:
-            queryset = queryset.filter(
-                Q(username__icontains=user) | Q(full_name__icontains=user)
-            )
+        queryset = self.queryset.order_by("id")
 
         if location:
             queryset = queryset.filter(location__icontains=location)
 
+        if user:
+            queryset = search_users(queryset, user)
+
         return queryset
 
     def perform_subscribe_action(self, subscribe_to, request, action_type):
@@ -79,12 +143,48 @@ class UserViewSet(
         )
         serializer.is_valid(raise_exception=True)
         result = serializer.perform_action(subscribe_to, request)
+        self.on_subscriptions_changed(request, [subscribe_to.id], action_type)
         return Response(result["message"], status=status.HTTP_200_OK)
 
+    @staticmethod
+    def on_subscriptions_changed(request, user_ids, action_type):
+        """Invalidate cached profiles and update user's timeline"""
+        invalidate("user", request.user.id, *user_ids)
+
+        timeline_task = (
+            backfill_timeline
+            if action_type == "subscribe"
+            else remove_from_timeline
+        )
+        transaction.on_commit(
+            lambda: timeline_task.delay(request.user.id, user_ids)
+        )
+
+    def perform_bulk_subscribe_action(self, request, action_type):
+        serializer = self.get_serializer(
+            data=request.data,
+            context={"request": request, "action": action_type},
+        )
+        serializer.is_valid(raise_exception=True)
+        result = serializer.perform_action(
+            serializer.validated_data["users"], request
+        )
+
+        if result["users"]:
+            self.on_subscriptions_changed(
+                request, result["users"], action_type
+            )
+
+        return Response(
+            {"message": result["message"], "users": result["users"]},
+            status=status.HTTP_200_OK,
+        )
+
     @action(
         methods=["POST"],
         detail=True,
         url_path="subscribe",
+        throttle_scope="subscribe",
         permission_classes=[IsAuthenticated],
     )
     def subscribe(self, request, pk=None):
@@ -98,6 +198,7 @@ class UserViewSet(
         methods=["POST"],
         detail=True,
         url_path="unsubscribe",
+        throttle_scope="subscribe",
         permission_classes=[IsAuthenticated],
     )
     def unsubscribe(self, request, pk=None):
@@ -107,6 +208,34 @@ class UserViewSet(
             subscribe_to, request, action_type="unsubscribe"
         )
 
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="bulk-subscribe",
+        throttle_scope="subscribe",
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_subscribe(self, request):
+        """Endpoint for adding up to BULK_SUBSCRIPTION_MAX_USERS users to your
+        subscriptions"""
+        return self.perform_bulk_subscribe_action(
+            request, action_type="subscribe"
+        )
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="bulk-unsubscribe",
+        throttle_scope="subscribe",
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_unsubscribe(self, request):
+        """Endpoint for removing up to BULK_SUBSCRIPTION_MAX_USERS users from
+        your subscriptions"""
+        return self.perform_bulk_subscribe_action(
+            request, action_type="unsubscribe"
+        )
+
     @action(
         methods=["GET"],
         detail=True,
@@ -119,13 +248,86 @@ class UserViewSet(
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
+    def paginate_users(self, queryset):
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="subscribers",
+        pagination_class=UserCursorPagination,
+    )
+    def subscribers(self, request, pk=None):
+        """Endpoint for listing user's subscribers"""
+        return self.paginate_users(self.get_object().subscribers)
+
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="subscriptions",
+        pagination_class=UserCursorPagination,
+    )
+    def subscriptions(self, request, pk=None):
+        """Endpoint for listing users the user is subscribed to"""
+        return self.paginate_users(self.get_object().subscribed_to.all())
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "expand",
+                type=OpenApiTypes.STR,
+                description=(
+                    "Inline first subscribers and subscriptions "
+                    "(ex. ?expand=subscribers,subscribed_to)"
+                ),
+            ),
+        ]
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type=OpenApiTypes.STR,
+                required=True,
+                description=(
+                    "Beginning of username or full name (ex. ?q=joh)"
+                ),
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="autocomplete",
+        pagination_class=None,
+    )
+    def autocomplete(self, request):
+        """Endpoint for suggesting users by the beginning of their username
+        or full name"""
+        prefix = request.query_params.get("q", "").strip()
+
+        if not prefix:
+            return Response([])
+
+        queryset = autocomplete_users(self.queryset, prefix)[
+            : self.autocomplete_limit
+        ]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
                 "user",
                 type=OpenApiTypes.STR,
                 description=(
-                    "Filter by username or full name " "(ex. ?user=John+Doe)"
+                    "Filter by username or full name, most similar first "
+                    "(ex. ?user=John+Doe)"
                 ),
             ),
             OpenApiParameter(
@@ -141,26 +343,46 @@ class UserViewSet(
         return super().list(request, *args, **kwargs)
 
 
+def list_used_posts(view, uses, key: str):
+    """Page of posts of HashtagUse or Mention rows. Rows are paginated
+    instead of posts, so pages are read in order of the (key, -created_at,
+    -id) index"""
+    page = view.paginate_queryset(
+        exclude_older_uses(uses, key)
+        .select_related("post__user")
+        .defer("post__search_vector")
+    )
+    serializer = view.get_serializer([use.post for use in page], many=True)
+    return view.get_paginated_response(serializer.data)
+
+
 class LikeMixin:
+    throttle_scope = None
+
     def perform_like_action(self, obj, request, action_type):
-        is_post = isinstance(obj, Post)  # to distinguish Post and Comment
         serializer = self.get_serializer(
             data={},
-            context={
-                "request": request,
-                "action": action_type,
-                "obj": obj.id,
-                "is_post": is_post,
-            },
+            context={"request": request, "action": action_type},
         )
         serializer.is_valid(raise_exception=True)
-        result = serializer.perform_action(obj, request)
+        post_id = obj.post_id if isinstance(obj, Comment) else obj.pk
+
+        with transaction.atomic():
+            result = serializer.perform_action(obj, request)
+
+            if action_type == "like":
+                LikedPost.record(request.user, post_id)
+            else:
+                LikedPost.forget([request.user], post_id)
+
+        invalidate_post(obj)
         return Response(result["message"], status=status.HTTP_200_OK)
 
     @action(
         methods=["POST"],
         detail=True,
         url_path="like",
+        throttle_scope="like",
         permission_classes=[IsAuthenticated],
     )
     def like(self, request, pk=None):
@@ -172,6 +394,7 @@ class LikeMixin:
         methods=["POST"],
         detail=True,
         url_path="unlike",
+        throttle_scope="like",
         permission_classes=[IsAuthenticated],
     )
     def unlike(self, request, pk=None):
@@ -180,51 +403,79 @@ class LikeMixin:
         return self.perform_like_action(obj, request, action_type="unlike")
 
 
-class PostViewSet(LikeMixin, viewsets.ModelViewSet):
-    queryset = Post.objects.prefetch_related(
-        "comments__users_liked", "users_liked", "comments__user"
-    ).select_related("user")
+class PostViewSet(
+    SerializerTimingMixin,
+    CachedRetrieveMixin,
+    LikeMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Post.objects.select_related("user").defer("search_vector")
     permission_classes = (
         IsAuthenticatedOrReadOnly,
         IsOwnerOrReadOnly,
     )
-    pagination_class = ListPagination
+    pagination_class = FeedPagination
+    cache_resource = "post"
 
     def get_liked_posts(self, queryset):
         """Returns queryset with liked posts and posts that have liked
-        comments"""
-        liked_posts = queryset.filter(
-            id__in=self.request.user.liked_posts.all()
-        )
-        liked_comment_posts = queryset.filter(
-            comments__in=self.request.user.liked_comments.all()
+        comments, annotated with the time of the latest like"""
+        return queryset.filter(
+            liked_activity__user=self.request.user
+        ).annotate(liked_at=F("liked_activity__liked_at"))
+
+    def get_search_results(self, queryset):
+        """Returns posts matching search query, optionally of one author and
+        created within a date range"""
+        params = PostSearchSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = {
+            "user_id": params.validated_data.get("author"),
+            "created_at__gte": params.validated_data.get("date_from"),
+            "created_at__lte": params.validated_data.get("date_to"),
+        }
+        queryset = queryset.filter(
+            **{key: value for key, value in filters.items() if value}
         )
-        return liked_comment_posts.union(liked_posts)
+        return search_posts(queryset, params.validated_data["q"])
 
     def get_queryset(self):
-        """Filter posts by subscriptions and likes"""
+        """Filter posts by subscriptions, likes and search query"""
         queryset = self.queryset
 
         if self.action == "subscriptions":
-            queryset = queryset.filter(
-                user__in=self.request.user.subscribed_to.all()
-            )
+            return get_timeline().filter_feed(queryset, self.request.user)
 
         if self.action == "liked":
-            queryset = self.get_liked_posts(queryset)
+            return self.get_liked_posts(queryset).order_by("-liked_at", "-id")
+
+        if self.action == "search":
+            return self.get_search_results(queryset).order_by(
+                "-relevance", "-created_at", "-id"
+            )
 
-        return queryset.order_by("-created_at")
+        return queryset.order_by("-created_at", "-id")
 
     def perform_create(self, serializer):
         """Create Post instance with currently authenticated user as value in
         'user' field"""
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_post(instance)
+
     def get_serializer_class(self):
         if self.action == "schedule":
-            return PostScheduleSerializer
-
-        if self.action in ("list", "subscriptions", "liked"):
+            return ScheduledPostSerializer
+
+        if self.action in (
+            "list",
+            "subscriptions",
+            "liked",
+            "search",
+            "mentions",
+        ):
             return PostListSerializer
 
         if self.action == "retrieve":
@@ -242,28 +493,22 @@ class PostViewSet(LikeMixin, viewsets.ModelViewSet):
         methods=["POST"],
         detail=False,
         url_path="schedule",
+        throttle_scope="schedule",
         permission_classes=[IsAuthenticated],
     )
     def schedule(self, request, pk=None):
-        """Endpoint for creating a scheduled Post"""
+        """Endpoint for creating a scheduled Post, same as creating it in
+        'scheduled-posts'"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        task_data = TaskSerializer.serialize_task_data(request)
-
-        schedule_post_create.apply_async(
-            (
-                task_data["user_id"],
-                task_data["request_data"],
-                task_data["media_path"],
-            ),
-            countdown=task_data["countdown"],
-        )
-        return Response("Post is scheduled!", status=status.HTTP_200_OK)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(
         methods=["POST"],
         detail=True,
         url_path="comment",
+        throttle_scope="comment",
         permission_classes=[IsAuthenticated],
     )
     def comment(self, request, pk=None):
@@ -271,7 +516,13 @@ class PostViewSet(LikeMixin, viewsets.ModelViewSet):
         fields"""
         comment = self.get_serializer(data=request.data)
         comment.is_valid(raise_exception=True)
-        comment.save(user=self.request.user, post=self.get_object())
+        post = self.get_object()
+
+        with transaction.atomic():
+            comment.save(user=self.request.user, post=post)
+            increment(Post, post.pk, "comments_count")
+            invalidate_post(post)
+
         return Response(comment.data, status=status.HTTP_200_OK)
 
     @action(
@@ -279,9 +530,11 @@ class PostViewSet(LikeMixin, viewsets.ModelViewSet):
         detail=False,
         url_path="my-feed",
         permission_classes=[IsAuthenticated],
+        pagination_class=TimelinePagination,
     )
     def subscriptions(self, request, pk=None):
         """Endpoint for displaying posts of only subscribed to users"""
+        pull_popular_posts(request.user)
         return super().list(request)
 
     @action(
@@ -289,22 +542,48 @@ class PostViewSet(LikeMixin, viewsets.ModelViewSet):
         detail=False,
         url_path="liked",
         permission_classes=[IsAuthenticated],
+        pagination_class=LikedPostsPagination,
     )
     def liked(self, request, pk=None):
-        """Endpoint for displaying liked posts"""
+        """Endpoint for displaying liked posts, most recently liked first"""
+        return super().list(request)
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="mentions",
+        permission_classes=[IsAuthenticated],
+        pagination_class=KeysetPagination,
+    )
+    def mentions(self, request, pk=None):
+        """Endpoint for displaying posts mentioning you in their text or
+        comments, most recently mentioning first"""
+        return list_used_posts(
+            self, Mention.objects.filter(user=request.user), "user"
+        )
+
+    @extend_schema(parameters=[PostSearchSerializer])
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="search",
+        pagination_class=PostSearchPagination,
+    )
+    def search(self, request, pk=None):
+        """Endpoint for full-text search of posts, most relevant and recent
+        first"""
         return super().list(request)
 
 
 class CommentViewSet(
+    SerializerTimingMixin,
     LikeMixin,
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
     mixins.DestroyModelMixin,
     GenericViewSet,
 ):
-    queryset = Comment.objects.prefetch_related(
-        "users_liked",
-    ).select_related("user", "post__user")
+    queryset = Comment.objects.select_related("user", "post__user")
     permission_classes = (
         IsAuthenticatedOrReadOnly,
         IsOwnerOrReadOnly,
@@ -319,3 +598,96 @@ class CommentViewSet(
             return LikeSerializer
 
         return CommentSerializer
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        users_liked = list(instance.users_liked.values_list("id", flat=True))
+        instance.delete()
+        increment(Post, instance.post_id, "comments_count", -1)
+        # the post stays in liked posts only of users who still like it
+        LikedPost.forget(users_liked, instance.post_id)
+        invalidate_post(instance)
+
+
+class HashtagViewSet(
+    SerializerTimingMixin, mixins.ListModelMixin, GenericViewSet
+):
+    queryset = Hashtag.objects.all()
+    serializer_class = HashtagSerializer
+    lookup_field = "name"
+    pagination_class = None
+
+    def get_queryset(self):
+        """Trending hashtags, precomputed by 'compute_trending_hashtags'"""
+        if self.action == "list":
+            return self.queryset.filter(trending__isnull=False).annotate(
+                uses=F("trending__uses")
+            ).order_by("-uses")
+
+        return self.queryset
+
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="posts",
+        serializer_class=PostListSerializer,
+        pagination_class=KeysetPagination,
+    )
+    def posts(self, request, name=None):
+        """Endpoint for displaying posts with the hashtag in their text or
+        comments, most recently tagged first"""
+        return list_used_posts(
+            self,
+            HashtagUse.objects.filter(hashtag__name=name.lower()),
+            "hashtag",
+        )
+
+
+class ScheduledPostViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
+    """Scheduled posts of the current user. Pending posts can be edited,
+    deleting a pending post cancels it"""
+
+    queryset = ScheduledPost.objects.all()
+    serializer_class = ScheduledPostSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = ListPagination
+
+    @property
+    def throttle_scope(self):
+        return "schedule" if self.action == "create" else None
+
+    def get_queryset(self):
+        queryset = self.queryset.filter(user=self.request.user).order_by(
+            "publish_at", "id"
+        )
+
+        if self.action in ("update", "partial_update", "destroy"):
+            # wait for a publisher which claimed the row to see its status
+            queryset = queryset.select_for_update()
+
+        return queryset
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        old_media = serializer.instance.media.name
+        media = serializer.save().media
+
+        if old_media and old_media != media.name:
+            transaction.on_commit(lambda: media.storage.delete(old_media))
+
+    @transaction.atomic
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        media = instance.media
+        instance.delete()
+
+        if media:
+            transaction.on_commit(lambda: media.storage.delete(media.name))
@@ -46,18 +46,19 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "rest_framework_simplejwt.token_blacklist",
-    "debug_toolbar",
     "drf_spectacular",
     "user",
     "social_media",
 ]
 
 MIDDLEWARE = [
+    "social_media.profiling.ProfilerMiddleware",
+    "social_media.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -66,6 +67,11 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# the toolbar slows every request down, it's loaded only for development
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(3, "debug_toolbar.middleware.DebugToolbarMiddleware")
+
 ROOT_URLCONF = "social_media_api.urls"
 
 TEMPLATES = [
@@ -141,6 +147,20 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "vol/web/media/"
 
+# Max width of resized copies of uploaded images, served to feeds instead of
+# originals. Every variant is encoded as WebP and JPEG without EXIF
+MEDIA_VARIANT_WIDTHS = {"small": 320, "medium": 640, "large": 1280}
+MEDIA_VARIANT_QUALITY = 80
+
+# Uploads are streamed to a temporary file in chunks instead of being held in
+# memory, and aborted once they exceed MEDIA_MAX_UPLOAD_SIZE
+FILE_UPLOAD_HANDLERS = [
+    "social_media.media.UploadSizeLimitHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+MEDIA_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+MEDIA_MAX_IMAGE_PIXELS = 40_000_000
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -149,13 +169,22 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "social_media.throttling.AnonSlidingWindowThrottle",
+        "social_media.throttling.UserSlidingWindowThrottle",
+        "social_media.throttling.ScopedSlidingWindowThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "30/day", "user": "100/day"},
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "30/day",
+        "user": "100/day",
+        "like": "120/hour",
+        "comment": "60/hour",
+        "subscribe": "60/hour",
+        "schedule": "30/hour",
+        "login": "10/minute",
+    },
 }
 
 SIMPLE_JWT = {
@@ -163,8 +192,25 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_REFRESH_SERIALIZER": (
+        "user.tokens.MirroredBlacklistTokenRefreshSerializer"
+    ),
+    "TOKEN_VERIFY_SERIALIZER": (
+        "user.tokens.MirroredBlacklistTokenVerifySerializer"
+    ),
 }
 
+# Blacklisted refresh tokens are mirrored to Redis sets, expired ones are
+# purged from the database and Redis in batches of this size
+TOKEN_BLACKLIST_BATCH_SIZE = 1000
+
+# Authenticated users are cached for AUTH_USER_CACHE_TIMEOUT in the shared
+# cache and for AUTH_USER_CACHE_LOCAL_TIMEOUT in memory of every process,
+# which bounds how long a deactivated user stays authenticated there
+AUTH_USER_CACHE_TIMEOUT = 300
+AUTH_USER_CACHE_LOCAL_TIMEOUT = 5
+AUTH_USER_CACHE_LOCAL_SIZE = 1000
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Social media API",
     "DESCRIPTION": "Make posts with media, follow other users, like and "
@@ -184,7 +230,88 @@ CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = "Europe/Kiev"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+# How often due scheduled posts are dispatched to publishing tasks
+SCHEDULED_POSTS_INTERVAL = timedelta(minutes=1)
+CELERY_BEAT_SCHEDULE = {
+    "compute-trending-hashtags": {
+        "task": "social_media.tasks.compute_trending_hashtags",
+        "schedule": timedelta(minutes=5),
+    },
+    "publish-scheduled-posts": {
+        "task": "social_media.tasks.publish_scheduled_posts",
+        "schedule": SCHEDULED_POSTS_INTERVAL,
+    },
+    "trim-timelines": {
+        "task": "social_media.tasks.trim_timelines",
+        "schedule": timedelta(hours=1),
+    },
+    "purge-token-blacklist": {
+        "task": "user.tasks.purge_token_blacklist",
+        "schedule": timedelta(hours=1),
+    },
+}
+
+# Redis of data which must not be evicted: Redis timelines and the token
+# blacklist mirror
+REDIS_URL = os.environ.get("REDIS_URL")
+# Redis of the cache, every key of which can be evicted
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", REDIS_URL)
+
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
+    }
+
+# Max number of users in a single bulk subscribe/unsubscribe request
+BULK_SUBSCRIPTION_MAX_USERS = 100
+
+TRENDING_HASHTAGS_WINDOW = timedelta(hours=24)
+TRENDING_HASHTAGS_LIMIT = 20
+
+# Max number of scheduled posts published by one task, with one INSERT
+SCHEDULED_POSTS_BATCH_SIZE = 500
+
+# PostgreSQL text search configuration of posts' search_vector
+POST_SEARCH_CONFIG = "english"
+
+# Timeout of cached post detail and user profile responses
+RESPONSE_CACHE_TIMEOUT = 5 * 60
+# Timeout of versions of cached responses, long enough to outlive them
+RESPONSE_VERSION_TIMEOUT = 24 * 60 * 60
+
+# Home timeline ("my-feed") storage: "database" or "redis"
+TIMELINE_BACKEND = os.environ.get("TIMELINE_BACKEND", "database")
+# Posts of authors with more subscribers are not fanned out on write, but
+# pulled into subscribers' timelines when they read their feed
+TIMELINE_FANOUT_MAX_SUBSCRIBERS = 10000
+TIMELINE_PULL_INTERVAL = 60  # seconds
+TIMELINE_PULL_TIMEOUT = 7 * 24 * 60 * 60  # seconds
+TIMELINE_MAX_LENGTH = 1000
+TIMELINE_BACKFILL_POSTS = 50
 
 DEBUG_TOOLBAR_CONFIG = {
     "SHOW_TOOLBAR_CALLBACK": lambda request: DEBUG,
 }
+
+# Networks allowed to scrape Prometheus metrics from /metrics
+METRICS_ALLOWED_IPS = os.environ.get(
+    "METRICS_ALLOWED_IPS", "127.0.0.1/32 ::1/128"
+).split()
+
+# Profiler of slow requests and Celery tasks, see social_media.profiling.
+# Profiles are viewed in the admin
+PROFILER_ENABLED = bool(os.environ.get("PROFILER_ENABLED", default=0))
+# Requests and tasks taking longer are profiled, in seconds
+PROFILER_THRESHOLD = float(os.environ.get("PROFILER_THRESHOLD", 1))
+PROFILER_TASK_THRESHOLD = float(os.environ.get("PROFILER_TASK_THRESHOLD", 10))
+# Share of requests and tasks profiled with cProfile whatever their duration
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", 0))
+# Requests of staff users with this header are always profiled
+PROFILER_HEADER = "X-Profile"
+PROFILER_INTERVAL = 0.005  # seconds between stack samples
+PROFILER_MAX_PROFILES = 500
+PROFILER_MAX_QUERIES = 1000  # recorded SQL queries per profile
+PROFILER_STATS_LIMIT = 100  # functions listed in cProfile statistics
@@ -0,0 +1,91 @@
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from social_media.cache import get_version
+from social_media.metrics import record_cache_lookup
+
+# user id -> (expiration time, user), per process
+local_users = {}
+
+
+def get_user_key(user_id, version: int) -> str:
+    return f"auth-user:{user_id}:{version}"
+
+
+def get_cached_user(user_id) -> tuple:
+    """Authenticated user from the local cache, then from the shared one,
+    and the version the user was looked up with. Shared entries are keyed
+    by the version of user's cached responses, which is bumped by
+    'invalidate_user' whenever the user is saved. On a miss the version must
+    be passed to 'set_cached_user', so a user read from the database while
+    it was being saved is stored under the old version and never served"""
+    now = time.monotonic()
+    expires_at, user = local_users.get(user_id, (0, None))
+    version = None
+
+    if expires_at <= now:
+        version = get_version("user", user_id)
+        user = cache.get(get_user_key(user_id, version))
+
+        if user is not None:
+            set_local_user(user_id, user)
+
+    record_cache_lookup(user is not None)
+
+    # a copy, so changes made during the request never leak into the cache
+    return copy.copy(user), version
+
+
+def set_local_user(user_id, user) -> None:
+    if len(local_users) >= settings.AUTH_USER_CACHE_LOCAL_SIZE:
+        local_users.pop(next(iter(local_users)), None)
+
+    local_users[user_id] = (
+        time.monotonic() + settings.AUTH_USER_CACHE_LOCAL_TIMEOUT,
+        user,
+    )
+
+
+def forget_local_user(user_id) -> None:
+    """Other processes keep their local copy for AUTH_USER_CACHE_LOCAL_TIMEOUT
+    at most"""
+    local_users.pop(user_id, None)
+
+
+def set_cached_user(user, version: int) -> None:
+    """Cache the user read from the database under the version returned by
+    'get_cached_user' before the read"""
+    cache.set(
+        get_user_key(user.pk, version),
+        user,
+        timeout=settings.AUTH_USER_CACHE_TIMEOUT,
+    )
+
+    # the user could be saved while it was read, keep only a current one
+    if get_version("user", user.pk) == version:
+        set_local_user(user.pk, copy.copy(user))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication which resolves users from the cache instead of
+    querying the database on every request. Views changing the user itself
+    should use JWTAuthentication to work with a fresh instance"""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        user, version = get_cached_user(user_id)
+
+        if user is None:
+            user = super().get_user(validated_token)
+            set_cached_user(user, version)
+
+        return user
@@ -0,0 +1,149 @@
+import logging
+from functools import cache as memoize
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+KEY_PREFIX = "token-blacklist"
+READY_KEY = f"{KEY_PREFIX}:ready"
+BUCKET_SECONDS = 3600
+
+logger = logging.getLogger(__name__)
+
+
+@memoize
+def get_client():
+    """Redis client of the blacklist mirror, None if REDIS_URL is not set
+    and the blacklist is checked in the database only"""
+    if settings.REDIS_URL:
+        return redis.Redis.from_url(settings.REDIS_URL)
+
+    return None
+
+
+def get_bucket(exp: int) -> int:
+    return exp // BUCKET_SECONDS
+
+
+def get_bucket_key(exp: int) -> str:
+    """Blacklisted JTIs are grouped in Redis sets by the hour their tokens
+    expire in, so expired ones are dropped a set at a time. The sets have no
+    TTL, so they are dropped only by 'purge_expired'"""
+    return f"{KEY_PREFIX}:{get_bucket(exp)}"
+
+
+def update_mirror(command: str, jti: str, exp: int) -> None:
+    """Run SADD or SREM of the JTI on its bucket set. If Redis fails, the
+    mirror is marked incomplete, so checks use the database until
+    'rebuild' completes it again"""
+    client = get_client()
+
+    if client is None:
+        return
+
+    try:
+        getattr(client, command)(get_bucket_key(exp), jti)
+    except redis.RedisError:
+        logger.warning("Failed to mirror blacklisted token %s", jti)
+
+        try:
+            client.delete(READY_KEY)
+        except redis.RedisError:
+            logger.exception("Failed to mark token blacklist incomplete")
+
+
+def add(jti: str, exp: int) -> None:
+    """Mirror the JTI of a token blacklisted in the database"""
+    update_mirror("sadd", jti, exp)
+
+
+def remove(jti: str, exp: int) -> None:
+    """Drop the JTI of a token removed from the blacklist in the database"""
+    update_mirror("srem", jti, exp)
+
+
+def is_blacklisted(jti: str, exp: int) -> bool:
+    """Single SISMEMBER while the mirror is complete. Falls back to the
+    database until 'rebuild' fills it, e.g. after Redis lost its data, and
+    while Redis is unavailable"""
+    client = get_client()
+
+    if client:
+        try:
+            with client.pipeline(transaction=False) as pipe:
+                ready, member = (
+                    pipe.exists(READY_KEY)
+                    .sismember(get_bucket_key(exp), jti)
+                    .execute()
+                )
+        except redis.RedisError:
+            ready = False
+
+        if ready:
+            return bool(member)
+
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def rebuild(batch_size: int) -> None:
+    """Mirror JTIs of all unexpired blacklisted tokens into Redis"""
+    client = get_client()
+
+    if client is None or client.exists(READY_KEY):
+        return
+
+    tokens = BlacklistedToken.objects.filter(
+        token__expires_at__gt=timezone.now()
+    ).values_list("token__jti", "token__expires_at")
+
+    with client.pipeline(transaction=False) as pipe:
+        for jti, expires_at in tokens.iterator(chunk_size=batch_size):
+            pipe.sadd(get_bucket_key(int(expires_at.timestamp())), jti)
+
+            if len(pipe) >= batch_size:
+                pipe.execute()
+
+        pipe.set(READY_KEY, 1)
+        pipe.execute()
+
+
+def purge_expired(batch_size: int) -> int:
+    """Delete expired outstanding tokens, with their blacklist entries, in
+    batches of 'batch_size' rows, and drop their Redis sets. Returns the
+    number of deleted outstanding tokens"""
+    now = timezone.now()
+    deleted = 0
+
+    while True:
+        token_ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now).values_list(
+                "id", flat=True
+            )[:batch_size]
+        )
+
+        if not token_ids:
+            break
+
+        # raw delete skips post_delete receivers, expired JTIs leave the
+        # mirror with their buckets below
+        BlacklistedToken.objects.filter(token_id__in=token_ids)._raw_delete(
+            BlacklistedToken.objects.db
+        )
+        count, _ = OutstandingToken.objects.filter(id__in=token_ids).delete()
+        deleted += count
+
+    client = get_client()
+
+    if client:
+        current_bucket = get_bucket(int(now.timestamp()))
+
+        for key in client.scan_iter(match=f"{KEY_PREFIX}:[0-9]*"):
+            if int(key.rsplit(b":", 1)[1]) < current_bucket:
+                client.delete(key)
+
+    return deleted
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("*"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def populate_counters(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    subscriptions = User.subscribed_to.through.objects
+
+    User.objects.update(
+        subscribers_count=count_subquery(subscriptions, "to_user"),
+        subscriptions_count=count_subquery(subscriptions, "from_user"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0002_remove_user_liked_comments_remove_user_liked_posts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="subscribers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="subscriptions_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+TRIGRAM_INDEXES = {
+    "user_username_trgm": "username",
+    "user_full_name_trgm": "full_name",
+    "user_location_trgm": "location",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """GIN trigram indexes on UPPER(field::text), the expression Django uses
+    for icontains/istartswith lookups on PostgreSQL. Built concurrently, so
+    user_user stays writable. Other databases have no pg_trgm and keep
+    scanning"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON user_user "
+            f"USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("user", "0003_user_subscription_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
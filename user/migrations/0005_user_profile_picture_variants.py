@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0004_user_search_trgm_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="profile_picture_variants",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
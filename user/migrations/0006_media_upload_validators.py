@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:07
+
+from django.db import migrations, models
+import social_media.media
+import user.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0005_user_profile_picture_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="profile_picture",
+            field=models.ImageField(
+                null=True,
+                upload_to=user.models.user_profile_picture_file_path,
+                validators=[social_media.media.validate_image_upload],
+            ),
+        ),
+    ]
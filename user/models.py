@@ -6,8 +6,8 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
-from django.forms.models import model_to_dict
 
+from social_media.media import validate_image_upload
 from social_media.models import Post, Comment
 
 
@@ -62,11 +62,19 @@ class User(AbstractUser):
     location = models.CharField(max_length=60, blank=True)
     website = models.URLField(max_length=100, blank=True)
     profile_picture = models.ImageField(
-        null=True, upload_to=user_profile_picture_file_path
+        null=True,
+        upload_to=user_profile_picture_file_path,
+        validators=[validate_image_upload],
     )
+    # resized copies of profile_picture, generated by 'generate_media_variants'
+    # task
+    profile_picture_variants = models.JSONField(default=dict, editable=False)
     subscribed_to = models.ManyToManyField(
         "self", blank=True, symmetrical=False
     )
+    # denormalized counters, kept in sync on subscribe/unsubscribe
+    subscribers_count = models.PositiveIntegerField(default=0)
+    subscriptions_count = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -75,11 +83,4 @@ class User(AbstractUser):
 
     @property
     def subscribers(self):
-        data = get_user_model().objects.filter(subscribed_to=self)
-        serialized_data = [model_to_dict(item) for item in data]
-        return serialized_data
-
-    @property
-    def subscribers_count(self):
-        subscribers = get_user_model().objects.filter(subscribed_to=self)
-        return subscribers.count()
+        return get_user_model().objects.filter(subscribed_to=self)
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from user import blacklist
+
+
+def get_exp(instance: BlacklistedToken) -> int:
+    return int(instance.token.expires_at.timestamp())
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def mirror_blacklisted_token(sender, instance, created, **kwargs):
+    """Mirror tokens blacklisted on logout, with 'RefreshToken.blacklist'
+    or in the admin"""
+    if created:
+        blacklist.add(instance.token.jti, get_exp(instance))
+
+
+@receiver(post_delete, sender=BlacklistedToken)
+def unmirror_blacklisted_token(sender, instance, **kwargs):
+    blacklist.remove(instance.token.jti, get_exp(instance))
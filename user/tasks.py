@@ -0,0 +1,13 @@
+from celery import shared_task
+from django.conf import settings
+
+from user import blacklist
+
+
+@shared_task
+def purge_token_blacklist():
+    """Deletes expired tokens from the blacklist and its Redis mirror, then
+    restores the mirror if Redis lost it. Runs periodically with Celery
+    beat"""
+    blacklist.purge_expired(settings.TOKEN_BLACKLIST_BATCH_SIZE)
+    blacklist.rebuild(settings.TOKEN_BLACKLIST_BATCH_SIZE)
@@ -1,3 +1,200 @@
+import json
+from unittest import mock
+
+import redis
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from user import blacklist
+from user.authentication import (
+    forget_local_user,
+    get_cached_user,
+    set_cached_user,
+)
+from user.tokens import MirroredBlacklistRefreshToken
+
+USER_LIST_URL = reverse("social_media:user-list")
+LOGOUT_URL = reverse("user:logout")
+TOKEN_REFRESH_URL = reverse("user:token_refresh")
+
+
+def create_user(number, **params):
+    defaults = {
+        "email": f"user{number}@test.com",
+        "username": f"user{number}",
+        "password": "test12345",
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(0)
+        forget_local_user(self.user.pk)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def get_user_queries(self) -> int:
+        """Queries of the user table made to authenticate a request"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(USER_LIST_URL)
+
+        self.assertEqual(response.status_code, 200)
+        table = get_user_model()._meta.db_table
+        return sum(
+            f'FROM "{table}" WHERE "{table}"."id" =' in query["sql"]
+            for query in queries
+        )
+
+    def save(self, user) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+    def test_cache_hit(self):
+        self.assertEqual(self.get_user_queries(), 1)
+        self.assertEqual(self.get_user_queries(), 0)
+
+        forget_local_user(self.user.pk)
+
+        self.assertEqual(self.get_user_queries(), 0)
+
+    def test_invalidated_on_password_change(self):
+        self.get_user_queries()
+        self.user.set_password("new-password")
+        self.save(self.user)
+
+        self.assertEqual(self.get_user_queries(), 1)
+        user, _ = get_cached_user(self.user.pk)
+        self.assertTrue(user.check_password("new-password"))
+
+    def test_invalidated_on_deactivation(self):
+        self.get_user_queries()
+        self.user.is_active = False
+        self.save(self.user)
+
+        response = self.client.get(USER_LIST_URL)
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_user_saved_during_lookup_is_not_cached(self):
+        user, version = get_cached_user(self.user.pk)
+        self.assertIsNone(user)
+        stale = get_user_model().objects.get(pk=self.user.pk)
+
+        self.user.is_active = False
+        self.save(self.user)
+        set_cached_user(stale, version)
+
+        user, _ = get_cached_user(self.user.pk)
+        self.assertIsNone(user)
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        self.user = create_user(0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.token = MirroredBlacklistRefreshToken.for_user(self.user)
+        self.jti = self.token["jti"]
+        self.exp = self.token["exp"]
+        self.redis = mock.MagicMock()
+        patcher = mock.patch.object(
+            blacklist, "get_client", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.set_mirror(ready=False, member=False)
+
+    def set_mirror(self, ready: bool, member: bool) -> None:
+        pipe = self.redis.pipeline.return_value.__enter__.return_value
+        pipe.exists.return_value.sismember.return_value.execute.return_value = [
+            ready,
+            member,
+        ]
+
+    def logout(self) -> None:
+        # the logout view reads the token from the body of a GET request
+        response = self.client.generic(
+            "GET",
+            LOGOUT_URL,
+            json.dumps({"refresh": str(self.token)}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_ready_mirror_is_checked_without_database(self):
+        self.set_mirror(ready=True, member=True)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(blacklist.is_blacklisted(self.jti, self.exp))
+
+    def test_database_used_until_mirror_is_ready(self):
+        self.logout()
+
+        self.assertTrue(blacklist.is_blacklisted(self.jti, self.exp))
+
+    def test_failed_mirror_write_marks_mirror_incomplete(self):
+        self.redis.sadd.side_effect = redis.ResponseError("OOM")
+
+        with self.assertLogs("user.blacklist", "WARNING"):
+            self.logout()
+
+        self.redis.delete.assert_called_once_with(blacklist.READY_KEY)
+
+    def test_database_used_when_redis_fails(self):
+        self.redis.sadd.side_effect = redis.ConnectionError
+        self.redis.delete.side_effect = redis.ConnectionError
+        self.redis.pipeline.side_effect = redis.ConnectionError
+
+        with self.assertLogs("user.blacklist", "WARNING"):
+            self.logout()
+
+        response = self.client.post(
+            TOKEN_REFRESH_URL, {"refresh": str(self.token)}
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_tokens_blacklisted_outside_logout_are_mirrored(self):
+        RefreshToken.for_user(self.user).blacklist()
+        outstanding = OutstandingToken.objects.get(jti=self.jti)
+        BlacklistedToken.objects.create(token=outstanding)
+
+        self.assertEqual(self.redis.sadd.call_count, 2)
+        self.redis.sadd.assert_called_with(
+            blacklist.get_bucket_key(self.exp), self.jti
+        )
+
+    def test_tokens_removed_from_blacklist_are_unmirrored(self):
+        self.logout()
+
+        BlacklistedToken.objects.get(token__jti=self.jti).delete()
+
+        self.redis.srem.assert_called_once_with(
+            blacklist.get_bucket_key(self.exp), self.jti
+        )
+
+    def test_purge_deletes_expired_tokens(self):
+        self.logout()
+        OutstandingToken.objects.update(expires_at=timezone.now())
+        self.redis.scan_iter.return_value = []
+
+        self.assertEqual(blacklist.purge_expired(batch_size=10), 1)
 
-# Create your tests here.
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.redis.srem.assert_not_called()
@@ -0,0 +1,38 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenRefreshSerializer,
+    TokenVerifySerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
+
+from user import blacklist
+
+
+class MirroredBlacklistRefreshToken(RefreshToken):
+    """RefreshToken checking the blacklist in its Redis mirror instead of
+    querying the growing token_blacklist tables"""
+
+    def check_blacklist(self) -> None:
+        if blacklist.is_blacklisted(
+            self.payload[api_settings.JTI_CLAIM], self.payload["exp"]
+        ):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class MirroredBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = MirroredBlacklistRefreshToken
+
+
+class MirroredBlacklistTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+
+        if blacklist.is_blacklisted(
+            token.get(api_settings.JTI_CLAIM), token["exp"]
+        ):
+            raise serializers.ValidationError("Token is blacklisted")
+
+        return {}
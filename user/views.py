@@ -3,22 +3,27 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import RefreshToken
-
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from social_media.metrics import SerializerTimingMixin
 from user.serializers import (
     UserSerializer,
     ManageUserSerializer,
     UpdateUserPasswordSerializer,
     UpdateUserProfilePictureSerializer,
 )
+from user.tokens import MirroredBlacklistRefreshToken
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(SerializerTimingMixin, generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class LoginView(TokenObtainPairView):
+    throttle_scope = "login"
+
+
+class ManageUserView(SerializerTimingMixin, generics.RetrieveUpdateAPIView):
     serializer_class = ManageUserSerializer
     authentication_classes = (JWTAuthentication,)
     permission_classes = (IsAuthenticated,)
@@ -27,7 +32,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
-class UpdateUserPasswordView(generics.UpdateAPIView):
+class UpdateUserPasswordView(SerializerTimingMixin, generics.UpdateAPIView):
     serializer_class = UpdateUserPasswordSerializer
     authentication_classes = (JWTAuthentication,)
     permission_classes = (IsAuthenticated,)
@@ -43,6 +48,6 @@ class UpdateUserProfilePictureView(ManageUserView):
 class BlacklistRefreshView(APIView):
     """Endpoint for logging out. Blacklists refresh token."""
     def get(self, request):
-        token = RefreshToken(request.data.get("refresh"))
+        token = MirroredBlacklistRefreshToken(request.data.get("refresh"))
         token.blacklist()
         return Response("Token invalidated")